@@ -1,3 +1,77 @@
 """
 File handlers for different file types
 """
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Process pool shared by all extractors, created on first use
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+def _init_worker(log_level: int) -> None:
+    """Configure logging in extraction worker processes"""
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+def get_pool_size() -> int:
+    """Get the number of extraction worker processes"""
+    workers = os.environ.get("MCP_VECTOR_EXTRACT_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    return max(1, (os.cpu_count() or 2) - 1)
+
+def get_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Get the shared extraction process pool, creating it on first use
+    
+    A pool broken by a crashed worker (out of memory, or a native parser
+    crashing on a bad file) is replaced with a new one.
+    
+    Args:
+        max_workers: Number of workers if the pool is created by this call
+            (defaults to MCP_VECTOR_EXTRACT_WORKERS or cpu_count - 1)
+    
+    Returns:
+        Process pool executor
+    """
+    global _POOL, _POOL_WORKERS
+    
+    with _POOL_LOCK:
+        if _POOL is not None and getattr(_POOL, '_broken', False):
+            logger.warning("Extraction process pool is broken, starting a new one")
+            _POOL.shutdown(wait=False)
+            _POOL = None
+        if _POOL is None:
+            _POOL_WORKERS = max_workers or get_pool_size()
+            _POOL = ProcessPoolExecutor(
+                max_workers=_POOL_WORKERS,
+                # Forking a process that runs the encoder, watchdog and server
+                # threads can deadlock the children on locks held at fork time
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(logging.getLogger().getEffectiveLevel(),)
+            )
+        return _POOL
+
+def get_pool_workers() -> int:
+    """Get the worker count of the shared pool (0 if not created yet)"""
+    return _POOL_WORKERS
+
+def shutdown_pool() -> None:
+    """Shut down the shared extraction process pool"""
+    global _POOL, _POOL_WORKERS
+    
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True)
+            _POOL = None
+            _POOL_WORKERS = 0
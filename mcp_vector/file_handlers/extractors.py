@@ -2,11 +2,36 @@
 File content extractors for different file types
 """
 import os
+import stat
 import logging
-from pathlib import Path
-from typing import Optional, Dict, List, Any, Tuple
+import zipfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, List, Any, Tuple, Iterable, Iterator, Set
+
+# Encoding detection libraries
+try:
+    import charset_normalizer
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
+try:
+    import cchardet
+    CCHARDET_AVAILABLE = True
+except ImportError:
+    CCHARDET_AVAILABLE = False
 
 # File type handling libraries
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
 try:
     import pypdf
     PYPDF_AVAILABLE = True
@@ -25,44 +50,101 @@ try:
 except ImportError:
     EXCEL_AVAILABLE = False
 
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
 try:
     from pptx import Presentation
     PPTX_AVAILABLE = True
 except ImportError:
     PPTX_AVAILABLE = False
 
+from . import get_pool, get_pool_workers
+
 logger = logging.getLogger(__name__)
 
+# Recently extracted documents keyed by (path, size, mtime_ns), bounded by
+# entry count and total text length; 0 disables
+EXTRACT_CACHE_SIZE = int(os.environ.get("MCP_VECTOR_EXTRACT_CACHE_SIZE", "256"))
+EXTRACT_CACHE_CHARS = int(os.environ.get("MCP_VECTOR_EXTRACT_CACHE_CHARS", "16000000"))
+# Larger documents are not cached, so one of them cannot flush the rest
+EXTRACT_CACHE_MAX_ENTRY_CHARS = EXTRACT_CACHE_CHARS // 16
+_EXTRACT_CACHE: "OrderedDict[Tuple[str, int, int], Tuple[str, Dict[str, Any]]]" = OrderedDict()
+_EXTRACT_CACHE_LOCK = threading.Lock()
+_extract_cache_chars = 0
+
+def get_extension(path: str) -> str:
+    """
+    Get the lower-case extension of a path, as os.path.splitext would
+    
+    Uses two rfind calls and a slice instead of splitext's generic
+    separator handling; names starting with a dot take the exact
+    splitext path.
+    
+    Args:
+        path: File path or file name
+    
+    Returns:
+        Extension including the leading dot, or an empty string
+    """
+    dot = path.rfind('.')
+    sep = path.rfind(os.sep)
+    if os.altsep:
+        sep = max(sep, path.rfind(os.altsep))
+    if dot <= sep + 1:
+        return ''
+    if path[sep + 1] == '.':
+        return os.path.splitext(path)[1].lower()
+    return path[dot:].lower()
+
 class FileHandler:
     """Base class for file handlers"""
     
-    @staticmethod
-    def can_handle(file_path: str) -> bool:
+    # Lower-case extensions handled, size limit in bytes and whether the
+    # required library is installed; set by each subclass
+    EXTENSIONS: Set[str] = set()
+    MAX_SIZE = 0
+    AVAILABLE = False
+    
+    @classmethod
+    def can_handle(cls, file_path: str, st: Optional[os.stat_result] = None) -> bool:
         """Check if this handler can process the given file"""
-        raise NotImplementedError
+        if not cls.AVAILABLE:
+            return False
+        ext = get_extension(file_path)
+        if ext not in cls.EXTENSIONS:
+            return False
+        if st is None:
+            st = os.stat(file_path)
+        return st.st_size < cls.MAX_SIZE
     
     @staticmethod
-    def extract_text(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    def extract_text(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, Dict[str, Any]]:
         """
         Extract text content from file
         
         Args:
             file_path: Path to the file
-            
+            st: Stat result for the file, if already known
+        
         Returns:
             Tuple of (extracted text, metadata)
         """
         raise NotImplementedError
     
     @staticmethod
-    def get_metadata(file_path: str) -> Dict[str, Any]:
+    def get_metadata(file_path: str, st: Optional[os.stat_result] = None) -> Dict[str, Any]:
         """Get basic metadata for any file"""
-        path = Path(file_path)
+        if st is None:
+            st = os.stat(file_path)
         return {
-            'filename': path.name,
-            'extension': path.suffix.lower(),
-            'size_bytes': path.stat().st_size,
-            'modified_time': path.stat().st_mtime,
+            'filename': os.path.basename(file_path),
+            'extension': get_extension(file_path),
+            'size_bytes': st.st_size,
+            'modified_time': st.st_mtime,
         }
 
 class TextFileHandler(FileHandler):
@@ -77,76 +159,206 @@ class TextFileHandler(FileHandler):
         '.py', '.java', '.c', '.cpp', '.h', '.hpp', '.cs', '.go', '.rb', '.php',
         '.sh', '.bat', '.ps1', '.sql'
     }
+    EXTENSIONS = TEXT_EXTENSIONS
+    MAX_SIZE = 5 * 1024 * 1024  # 5MB limit
+    AVAILABLE = True
+    
+    # Files above this size are sampled at both ends for encoding detection
+    DETECT_SAMPLE_THRESHOLD = 1024 * 1024
+    DETECT_SAMPLE_SIZE = 64 * 1024
     
     @staticmethod
-    def can_handle(file_path: str) -> bool:
-        """Check if this handler can process the given file"""
-        ext = Path(file_path).suffix.lower()
-        return ext in TextFileHandler.TEXT_EXTENSIONS and os.path.getsize(file_path) < (5 * 1024 * 1024)  # 5MB limit
+    def detect_encoding(raw: bytes) -> Optional[str]:
+        """
+        Detect the character encoding of raw file contents
+        
+        Args:
+            raw: File contents
+        
+        Returns:
+            Encoding name, or None if it could not be detected
+        """
+        if len(raw) > TextFileHandler.DETECT_SAMPLE_THRESHOLD:
+            sample_size = TextFileHandler.DETECT_SAMPLE_SIZE
+            raw = raw[:sample_size] + raw[-sample_size:]
+        
+        if CHARSET_NORMALIZER_AVAILABLE:
+            match = charset_normalizer.from_bytes(raw).best()
+            return match.encoding if match else None
+        
+        if CCHARDET_AVAILABLE:
+            return cchardet.detect(raw).get('encoding')
+        
+        return None
     
     @staticmethod
-    def extract_text(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    def extract_text(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, Dict[str, Any]]:
         """Extract text from a text file"""
-        metadata = FileHandler.get_metadata(file_path)
+        metadata = FileHandler.get_metadata(file_path, st)
         
         try:
-            # Try to detect encoding
-            encodings = ['utf-8', 'latin-1', 'cp1252']
-            content = ""
+            # Read into memory rather than memory-mapping: a watched file
+            # truncated while mapped would kill the process with SIGBUS
+            with open(file_path, 'rb') as f:
+                raw = f.read()
             
-            for encoding in encodings:
+            # Most text is UTF-8 (or its ASCII subset); detection only runs
+            # when strict decoding fails, as it samples large files at both
+            # ends and could call a file with UTF-8 in the middle ASCII
+            try:
+                encoding = 'utf-8'
+                content = str(raw, encoding)
+            except UnicodeDecodeError:
+                encoding = TextFileHandler.detect_encoding(raw) or 'utf-8'
+                if encoding.lower() in ('ascii', 'us-ascii'):
+                    encoding = 'utf-8'
                 try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    metadata['encoding'] = encoding
-                    break
-                except UnicodeDecodeError:
-                    continue
+                    content = str(raw, encoding, 'replace')
+                except LookupError:
+                    encoding = 'utf-8'
+                    content = str(raw, encoding, 'replace')
+            metadata['encoding'] = encoding
             
             if not content:
                 logger.warning(f"Could not decode text file: {file_path}")
                 return "", metadata
-                
+            
             return content, metadata
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {e}")
             return "", metadata
 
+def _pdfium_page_text(pdf: "pdfium.PdfDocument", page_idx: int) -> str:
+    """Extract the text of one page of an open PDFium document"""
+    page = pdf[page_idx]
+    try:
+        text_page = page.get_textpage()
+        try:
+            return text_page.get_text_range()
+        finally:
+            text_page.close()
+    finally:
+        page.close()
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> Tuple[int, List[str]]:
+    """
+    Extract the text of a range of PDF pages with PDFium (runs in a worker process)
+    
+    Args:
+        file_path: Path to the PDF file
+        start: Zero-based index of the first page
+        end: Index one past the last page
+    
+    Returns:
+        Tuple of (first page index, page texts)
+    """
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return start, [_pdfium_page_text(pdf, i) for i in range(start, end)]
+    finally:
+        pdf.close()
+
 class PDFHandler(FileHandler):
     """Handler for PDF files"""
     
+    EXTENSIONS = {'.pdf'}
+    MAX_SIZE = 20 * 1024 * 1024  # 20MB limit
+    AVAILABLE = PDFIUM_AVAILABLE or PYPDF_AVAILABLE
+    
+    # Documents with fewer pages are extracted in-process; re-opening the
+    # file in every worker only pays off for larger files
+    PARALLEL_MIN_PAGES = 8
+    
     @staticmethod
-    def can_handle(file_path: str) -> bool:
-        """Check if this handler can process the given file"""
-        if not PYPDF_AVAILABLE:
-            return False
-        ext = Path(file_path).suffix.lower()
-        return ext == '.pdf' and os.path.getsize(file_path) < (20 * 1024 * 1024)  # 20MB limit
+    def _use_parallel(page_count: int) -> bool:
+        """Check whether pages should be extracted in the worker pool"""
+        # Small documents (and extraction already running inside a worker
+        # process) are handled serially
+        return page_count >= PDFHandler.PARALLEL_MIN_PAGES and multiprocessing.parent_process() is None
     
     @staticmethod
-    def extract_text(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    def _read_pdfium(file_path: str, metadata: Dict[str, Any]) -> Optional[List[str]]:
+        """
+        Read a PDF with PDFium
+        
+        Args:
+            file_path: Path to the PDF file
+            metadata: Metadata dict to fill with page count and document info
+        
+        Returns:
+            Page texts, or None if the pages should be extracted in parallel
+        """
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            page_count = len(pdf)
+            metadata['page_count'] = page_count
+            
+            # Extract document info
+            for key, value in pdf.get_metadata_dict(skip_empty=True).items():
+                if key and isinstance(value, str):
+                    metadata[f'pdf_{key.lower()}'] = value
+            
+            if PDFHandler._use_parallel(page_count):
+                return None
+            return [_pdfium_page_text(pdf, i) for i in range(page_count)]
+        finally:
+            pdf.close()
+    
+    @staticmethod
+    def _read_pypdf(file_path: str, metadata: Dict[str, Any]) -> List[str]:
+        """
+        Read a PDF with pypdf
+        
+        pypdf re-parses the whole document on every open, so its pages are
+        always extracted serially.
+        
+        Args:
+            file_path: Path to the PDF file
+            metadata: Metadata dict to fill with page count and document info
+        
+        Returns:
+            Page texts
+        """
+        with open(file_path, 'rb') as f:
+            pdf = pypdf.PdfReader(f)
+            page_count = len(pdf.pages)
+            metadata['page_count'] = page_count
+            
+            # Extract document info
+            if pdf.metadata:
+                for key, value in pdf.metadata.items():
+                    if key and value and isinstance(key, str):
+                        clean_key = key.strip('/').lower()
+                        if isinstance(value, str):
+                            metadata[f'pdf_{clean_key}'] = value
+            
+            return [page.extract_text() for page in pdf.pages]
+    
+    @staticmethod
+    def extract_text(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, Dict[str, Any]]:
         """Extract text from a PDF file"""
-        metadata = FileHandler.get_metadata(file_path)
+        metadata = FileHandler.get_metadata(file_path, st)
         
         try:
-            with open(file_path, 'rb') as f:
-                pdf = pypdf.PdfReader(f)
-                metadata['page_count'] = len(pdf.pages)
-                
-                # Extract document info
-                if pdf.metadata:
-                    for key, value in pdf.metadata.items():
-                        if key and value and isinstance(key, str):
-                            clean_key = key.strip('/').lower()
-                            if isinstance(value, str):
-                                metadata[f'pdf_{clean_key}'] = value
-                
-                # Extract text
-                text = ""
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n\n"
-                
-                return text, metadata
+            if PDFIUM_AVAILABLE:
+                parts = PDFHandler._read_pdfium(file_path, metadata)
+            else:
+                parts = PDFHandler._read_pypdf(file_path, metadata)
+            
+            if parts is None:
+                # Give each worker one contiguous page range, so the document
+                # is opened once per worker, and join them back in page order
+                executor = get_pool()
+                page_count = metadata['page_count']
+                ranges = max(1, min(get_pool_workers(), page_count))
+                bounds = [page_count * i // ranges for i in range(ranges + 1)]
+                futures = [executor.submit(_extract_pdf_pages, file_path, bounds[i], bounds[i + 1])
+                           for i in range(ranges)]
+                pages = sorted((future.result() for future in as_completed(futures)), key=lambda r: r[0])
+                parts = [page_text for _, texts in pages for page_text in texts]
+            
+            parts.append("")  # keep the separator after the last page
+            return "\n\n".join(parts), metadata
         except Exception as e:
             logger.error(f"Error extracting text from PDF {file_path}: {e}")
             return "", metadata
@@ -154,18 +366,14 @@ class PDFHandler(FileHandler):
 class DocxHandler(FileHandler):
     """Handler for DOCX files"""
     
-    @staticmethod
-    def can_handle(file_path: str) -> bool:
-        """Check if this handler can process the given file"""
-        if not DOCX_AVAILABLE:
-            return False
-        ext = Path(file_path).suffix.lower()
-        return ext == '.docx' and os.path.getsize(file_path) < (10 * 1024 * 1024)  # 10MB limit
+    EXTENSIONS = {'.docx'}
+    MAX_SIZE = 10 * 1024 * 1024  # 10MB limit
+    AVAILABLE = DOCX_AVAILABLE
     
     @staticmethod
-    def extract_text(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    def extract_text(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, Dict[str, Any]]:
         """Extract text from a DOCX file"""
-        metadata = FileHandler.get_metadata(file_path)
+        metadata = FileHandler.get_metadata(file_path, st)
         
         try:
             doc = Document(file_path)
@@ -176,20 +384,22 @@ class DocxHandler(FileHandler):
                 metadata['author'] = core_props.author
                 metadata['created'] = core_props.created.isoformat() if core_props.created else None
                 metadata['title'] = core_props.title
-                
+            
             # Extract text
-            text = ""
+            parts = []
             for para in doc.paragraphs:
-                text += para.text + "\n"
+                parts.append(para.text)
+                parts.append("\n")
             
             # Get text from tables
             for table in doc.tables:
                 for row in table.rows:
                     for cell in row.cells:
-                        text += cell.text + " "
-                    text += "\n"
+                        parts.append(cell.text)
+                        parts.append(" ")
+                    parts.append("\n")
             
-            return text, metadata
+            return "".join(parts), metadata
         except Exception as e:
             logger.error(f"Error extracting text from DOCX {file_path}: {e}")
             return "", metadata
@@ -197,38 +407,79 @@ class DocxHandler(FileHandler):
 class ExcelHandler(FileHandler):
     """Handler for Excel files"""
     
+    EXTENSIONS = {'.xlsx', '.xls'}
+    MAX_SIZE = 10 * 1024 * 1024  # 10MB limit
+    AVAILABLE = CALAMINE_AVAILABLE or EXCEL_AVAILABLE
+    
     @staticmethod
-    def can_handle(file_path: str) -> bool:
-        """Check if this handler can process the given file"""
-        if not EXCEL_AVAILABLE:
-            return False
-        ext = Path(file_path).suffix.lower()
-        return ext in ['.xlsx', '.xls'] and os.path.getsize(file_path) < (10 * 1024 * 1024)  # 10MB limit
+    def _render_calamine_row(row: List[Any]) -> List[str]:
+        """
+        Render a calamine row to cell strings in a single pass
+        
+        Empty cells are skipped and integral floats are printed as ints,
+        matching the openpyxl output. Strings, the common case, are passed
+        through without a str() call.
+        """
+        return [
+            cell if type(cell) is str
+            else ('%d' % cell if type(cell) is float and cell.is_integer() else str(cell))
+            for cell in row if cell is not None and cell != ""
+        ]
+    
+    @staticmethod
+    def _render_openpyxl_row(row: Tuple[Any, ...]) -> List[str]:
+        """Render an openpyxl row to cell strings"""
+        return [str(cell) for cell in row if cell is not None]
+    
+    @staticmethod
+    def _read_calamine(file_path: str) -> Tuple[List[str], Iterator[Tuple[str, Iterable[List[str]]]]]:
+        """Open a workbook with calamine and return its sheet names and rendered rows"""
+        workbook = CalamineWorkbook.from_path(file_path)
+        sheet_names = list(workbook.sheet_names)
+        
+        def sheets():
+            for sheet_name in sheet_names:
+                rows = workbook.get_sheet_by_name(sheet_name).to_python()
+                yield sheet_name, map(ExcelHandler._render_calamine_row, rows)
+        
+        return sheet_names, sheets()
     
     @staticmethod
-    def extract_text(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    def _read_openpyxl(file_path: str) -> Tuple[List[str], Iterator[Tuple[str, Iterable[List[str]]]]]:
+        """Open a workbook with openpyxl and return its sheet names and rendered rows"""
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        sheet_names = workbook.sheetnames
+        
+        def sheets():
+            for sheet_name in sheet_names:
+                rows = workbook[sheet_name].iter_rows(values_only=True)
+                yield sheet_name, map(ExcelHandler._render_openpyxl_row, rows)
+        
+        return sheet_names, sheets()
+    
+    @staticmethod
+    def extract_text(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, Dict[str, Any]]:
         """Extract text from an Excel file"""
-        metadata = FileHandler.get_metadata(file_path)
+        metadata = FileHandler.get_metadata(file_path, st)
         
         try:
-            workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
-            metadata['sheet_names'] = workbook.sheetnames
+            if CALAMINE_AVAILABLE:
+                sheet_names, sheets = ExcelHandler._read_calamine(file_path)
+            else:
+                sheet_names, sheets = ExcelHandler._read_openpyxl(file_path)
+            metadata['sheet_names'] = sheet_names
             
-            text = ""
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                text += f"Sheet: {sheet_name}\n"
+            parts = []
+            for sheet_name, rows in sheets:
+                parts.append(f"Sheet: {sheet_name}\n")
                 
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = []
-                    for cell in row:
-                        if cell is not None:
-                            row_text.append(str(cell))
+                for row_text in rows:
                     if row_text:
-                        text += " | ".join(row_text) + "\n"
-                text += "\n"
+                        parts.append(" | ".join(row_text))
+                        parts.append("\n")
+                parts.append("\n")
             
-            return text, metadata
+            return "".join(parts), metadata
         except Exception as e:
             logger.error(f"Error extracting text from Excel {file_path}: {e}")
             return "", metadata
@@ -236,38 +487,35 @@ class ExcelHandler(FileHandler):
 class PowerPointHandler(FileHandler):
     """Handler for PowerPoint files"""
     
-    @staticmethod
-    def can_handle(file_path: str) -> bool:
-        """Check if this handler can process the given file"""
-        if not PPTX_AVAILABLE:
-            return False
-        ext = Path(file_path).suffix.lower()
-        return ext in ['.pptx', '.ppt'] and os.path.getsize(file_path) < (15 * 1024 * 1024)  # 15MB limit
+    EXTENSIONS = {'.pptx', '.ppt'}
+    MAX_SIZE = 15 * 1024 * 1024  # 15MB limit
+    AVAILABLE = PPTX_AVAILABLE
     
     @staticmethod
-    def extract_text(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    def extract_text(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, Dict[str, Any]]:
         """Extract text from a PowerPoint file"""
-        metadata = FileHandler.get_metadata(file_path)
+        metadata = FileHandler.get_metadata(file_path, st)
         
         try:
             prs = Presentation(file_path)
             metadata['slide_count'] = len(prs.slides)
             
-            text = ""
+            parts = []
             for i, slide in enumerate(prs.slides):
-                text += f"Slide {i+1}:\n"
+                parts.append(f"Slide {i+1}:\n")
                 
                 if slide.title:
                     title_text = slide.title.text if hasattr(slide.title, 'text') else ""
-                    text += f"Title: {title_text}\n"
+                    parts.append(f"Title: {title_text}\n")
                 
                 for shape in slide.shapes:
                     if hasattr(shape, "text") and shape.text:
-                        text += shape.text + "\n"
+                        parts.append(shape.text)
+                        parts.append("\n")
                 
-                text += "\n"
+                parts.append("\n")
             
-            return text, metadata
+            return "".join(parts), metadata
         except Exception as e:
             logger.error(f"Error extracting text from PowerPoint {file_path}: {e}")
             return "", metadata
@@ -282,25 +530,262 @@ def get_file_handlers() -> List[type]:
         PowerPointHandler
     ]
 
-def extract_file_content(file_path: str) -> Tuple[str, Dict[str, Any]]:
+# Extension -> (handler class, size limit) lookup for handlers whose
+# libraries are installed
+_EXT_HANDLERS: Dict[str, Tuple[type, int]] = {
+    ext: (handler_class, handler_class.MAX_SIZE)
+    for handler_class in get_file_handlers() if handler_class.AVAILABLE
+    for ext in handler_class.EXTENSIONS
+}
+
+# Content kind each binary format's extension must sniff as; text formats
+# are cheap to attempt and are not checked
+_EXPECTED_KIND = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.xlsx': 'xlsx',
+    '.pptx': 'pptx',
+    '.xls': 'ole',
+    '.ppt': 'ole',
+}
+
+# Leading bytes read for sniffing; PDF readers accept the %PDF- marker
+# anywhere in the first 1 KB
+_SNIFF_BYTES = 1024
+
+def _sniff(file_path: str) -> str:
+    """
+    Classify a file by its leading bytes
+    
+    Args:
+        file_path: Path to the file
+    
+    Returns:
+        One of 'pdf', 'docx', 'xlsx', 'pptx', 'zip', 'ole', 'text' or 'binary'
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(_SNIFF_BYTES)
+    
+    if b'%PDF-' in head:
+        return 'pdf'
+    
+    if head.startswith(b'PK\x03\x04'):
+        # Office Open XML containers are told apart by their part folders
+        try:
+            with zipfile.ZipFile(file_path) as zf:
+                names = zf.namelist()
+        except zipfile.BadZipFile:
+            return 'binary'
+        for prefix, kind in (('word/', 'docx'), ('xl/', 'xlsx'), ('ppt/', 'pptx')):
+            if any(name.startswith(prefix) for name in names):
+                return kind
+        return 'zip'
+    
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return 'ole'
+    
+    if b'\x00' in head[:8] and not head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'binary'
+    
+    return 'text'
+
+def _stat_once(file_path: str) -> Optional[os.stat_result]:
+    """Stat a file, returning None if it does not exist"""
+    try:
+        return os.stat(file_path)
+    except OSError:
+        return None
+
+def get_supported_extensions() -> Set[str]:
+    """Get the file extensions that an installed handler can process"""
+    return set(_EXT_HANDLERS)
+
+def _cache_key(file_path: str, st: os.stat_result) -> Tuple[str, int, int]:
+    """Build the extraction cache key of a file"""
+    return (file_path, st.st_size, st.st_mtime_ns)
+
+def _cache_get(key: Tuple[str, int, int]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Look up a cached extraction result, returning a copy of its metadata"""
+    with _EXTRACT_CACHE_LOCK:
+        hit = _EXTRACT_CACHE.get(key)
+        if hit is None:
+            return None
+        _EXTRACT_CACHE.move_to_end(key)
+    
+    text, metadata = hit
+    return text, dict(metadata)
+
+def _cache_put(key: Tuple[str, int, int], result: Tuple[str, Dict[str, Any]]) -> None:
+    """Store an extraction result, evicting the least recently used ones"""
+    global _extract_cache_chars
+    
+    text, metadata = result
+    if EXTRACT_CACHE_SIZE <= 0 or len(text) > EXTRACT_CACHE_MAX_ENTRY_CHARS:
+        return
+    
+    with _EXTRACT_CACHE_LOCK:
+        old = _EXTRACT_CACHE.pop(key, None)
+        if old is not None:
+            _extract_cache_chars -= len(old[0])
+        _EXTRACT_CACHE[key] = (text, dict(metadata))
+        _extract_cache_chars += len(text)
+        while len(_EXTRACT_CACHE) > EXTRACT_CACHE_SIZE or _extract_cache_chars > EXTRACT_CACHE_CHARS:
+            _, (evicted, _) = _EXTRACT_CACHE.popitem(last=False)
+            _extract_cache_chars -= len(evicted)
+
+def extract_file_content(file_path: str, use_cache: bool = True) -> Tuple[str, Dict[str, Any]]:
     """
     Extract text content from a file using the appropriate handler
     
     Args:
         file_path: Path to the file
-        
+        use_cache: Whether to use the in-memory cache of recent extractions
+    
     Returns:
         Tuple of (extracted text, metadata)
     """
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+    # Stat once; the result is shared by the cache key, the size check and
+    # the metadata
+    st = _stat_once(file_path)
+    if st is None or not stat.S_ISREG(st.st_mode):
         logger.warning(f"File does not exist or is not a regular file: {file_path}")
         return "", {"error": "File not found or not a regular file"}
     
+    if not use_cache:
+        return _extract_with_stat(file_path, st)
+    
+    key = _cache_key(file_path, st)
+    hit = _cache_get(key)
+    if hit is not None:
+        logger.debug(f"Using cached extraction for {file_path}")
+        return hit
+    
+    result = _extract_with_stat(file_path, st)
+    _cache_put(key, result)
+    return result
+
+def _extract_with_stat(file_path: str, st: os.stat_result) -> Tuple[str, Dict[str, Any]]:
+    """Extract text content from a regular file that has already been stat'ed"""
     # Find the appropriate handler
-    for handler_class in get_file_handlers():
-        if handler_class.can_handle(file_path):
-            logger.debug(f"Using {handler_class.__name__} for {file_path}")
-            return handler_class.extract_text(file_path)
+    ext = get_extension(file_path)
+    handler_class, size_limit = _EXT_HANDLERS.get(ext, (None, 0))
+    if handler_class is not None and st.st_size < size_limit:
+        # Skip mis-named files before starting an expensive parser on them
+        expected_kind = _EXPECTED_KIND.get(ext)
+        if expected_kind is not None:
+            try:
+                kind = _sniff(file_path)
+            except OSError as e:
+                # Removed or made unreadable since it was stat'ed
+                logger.error(f"Error reading {file_path}: {e}")
+                return "", FileHandler.get_metadata(file_path, st)
+            if kind != expected_kind:
+                logger.warning(f"File content ({kind}) does not match extension {ext}: {file_path}")
+                return "", FileHandler.get_metadata(file_path, st)
+        
+        logger.debug(f"Using {handler_class.__name__} for {file_path}")
+        return handler_class.extract_text(file_path, st)
     
     logger.warning(f"No handler found for file: {file_path}")
-    return "", FileHandler.get_metadata(file_path)
+    return "", FileHandler.get_metadata(file_path, st)
+
+def _extract_uncached(file_paths: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Extract several files in a worker process, bypassing its cache"""
+    results = []
+    for file_path in file_paths:
+        # One failing file must not take the rest of its group with it
+        try:
+            results.append(extract_file_content(file_path, use_cache=False))
+        except Exception as e:
+            logger.error(f"Error extracting {file_path}: {e}")
+            results.append(("", {"error": str(e)}))
+    return results
+
+def iter_extract_file_content(file_paths: List[str], num_workers: Optional[int] = None) -> Iterator[Tuple[int, Tuple[str, Dict[str, Any]]]]:
+    """
+    Extract text content from several files, yielding results as they finish
+    
+    Args:
+        file_paths: Paths to the files
+        num_workers: Number of worker processes if the shared pool is not
+            created yet (defaults to MCP_VECTOR_EXTRACT_WORKERS or cpu_count - 1)
+    
+    Returns:
+        Iterator of (index in file_paths, (extracted text, metadata)) tuples
+        in completion order
+    """
+    # Serve cache hits here; the workers' own caches are never consulted
+    misses = []
+    for i, file_path in enumerate(file_paths):
+        st = _stat_once(file_path)
+        key = _cache_key(file_path, st) if st is not None and stat.S_ISREG(st.st_mode) else None
+        hit = _cache_get(key) if key is not None else None
+        if hit is not None:
+            yield i, hit
+        else:
+            misses.append((i, file_path, key))
+    
+    if len(misses) == 1:
+        i, file_path, key = misses[0]
+        yield i, extract_file_content(file_path)
+        return
+    if not misses:
+        return
+    
+    executor = get_pool(num_workers)
+    
+    # Send several small files per task to amortize the pickling overhead,
+    # but keep tasks small enough that results arrive steadily
+    chunksize = max(1, len(misses) // (4 * get_pool_workers()))
+    futures = {}
+    for start in range(0, len(misses), chunksize):
+        group = misses[start:start + chunksize]
+        future = executor.submit(_extract_uncached, [file_path for _, file_path, _ in group])
+        futures[future] = group
+    
+    # Files whose task was lost when a worker crashed
+    broken = []
+    for future in as_completed(futures):
+        group = futures[future]
+        try:
+            extracted = future.result()
+        except BrokenProcessPool:
+            broken.extend(group)
+            continue
+        except Exception as e:
+            logger.error(f"Error extracting {len(group)} files: {e}")
+            extracted = [("", {"error": str(e)})] * len(group)
+        for (i, _, key), result in zip(group, extracted):
+            if key is not None:
+                _cache_put(key, result)
+            yield i, result
+    
+    # Retry them one at a time in a fresh pool, so only a file that crashes
+    # a worker again is given up on
+    for i, file_path, key in broken:
+        try:
+            result = get_pool(num_workers).submit(_extract_uncached, [file_path]).result()[0]
+        except BrokenProcessPool:
+            logger.error(f"Extraction worker crashed on {file_path}")
+            yield i, ("", {"error": "Extraction worker crashed"})
+            continue
+        if key is not None:
+            _cache_put(key, result)
+        yield i, result
+
+def extract_file_content_batch(file_paths: List[str], num_workers: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Extract text content from several files in parallel worker processes
+    
+    Args:
+        file_paths: Paths to the files
+        num_workers: Number of worker processes if the shared pool is not
+            created yet (defaults to MCP_VECTOR_EXTRACT_WORKERS or cpu_count - 1)
+    
+    Returns:
+        List of (extracted text, metadata) tuples in the same order as file_paths
+    """
+    results: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * len(file_paths)
+    for i, result in iter_extract_file_content(file_paths, num_workers):
+        results[i] = result
+    return results
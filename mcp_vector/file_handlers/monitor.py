@@ -2,14 +2,18 @@
 File system monitoring for detecting file changes
 """
 import os
+import stat
 import time
 import threading
 import logging
-from typing import List, Dict, Any, Callable, Set
+import heapq
+import functools
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Set, Optional, Tuple
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
-from .extractors import extract_file_content
+from .extractors import get_supported_extensions, get_extension
 
 logger = logging.getLogger(__name__)
 
@@ -30,42 +34,56 @@ class FileMonitor:
             on_file_added: Callback when a file is added
             on_file_modified: Callback when a file is modified
             on_file_deleted: Callback when a file is deleted
-            file_extensions: Set of file extensions to monitor (None for all)
+            file_extensions: Set of file extensions to monitor (None for all supported)
         """
         self.watch_folders = [Path(folder).resolve() for folder in watch_folders]
+        
+        # Realpath'd folders and their prefixes (with trailing separator) for
+        # fast containment checks on file system events
+        self._resolved_watch = frozenset(os.path.realpath(folder) for folder in self.watch_folders)
+        self._watch_prefixes = tuple(os.path.join(folder, '') for folder in self._resolved_watch)
+        self._realpath = functools.lru_cache(maxsize=4096)(os.path.realpath)
         self.on_file_added = on_file_added
         self.on_file_modified = on_file_modified
         self.on_file_deleted = on_file_deleted
         self.file_extensions = file_extensions
         
+        # Files without an installed handler are never worth processing
+        self._valid_extensions = file_extensions if file_extensions is not None else get_supported_extensions()
+        
         self.observer = None
         self.stopped = threading.Event()
         self.lock = threading.RLock()
         
         # Keep track of processing files to avoid duplicate events
         self.processing_files = set()
+        
+        # Debounced events are kept as path -> (deadline, event_type) and a
+        # min-heap of (deadline, path) served by a single scheduler thread
+        self.debounce_time = 1.0  # seconds
+        self._pending: Dict[str, Tuple[float, str]] = {}
+        self._pending_heap: List[Tuple[float, str]] = []
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._scheduler_thread = None
     
-    def _is_valid_file(self, path: str) -> bool:
+    def _is_valid_file(self, path: str, st: Optional[os.stat_result] = None) -> bool:
         """Check if the file should be processed"""
-        if not os.path.isfile(path):
+        # Check the extension first; it needs no syscall
+        if get_extension(path) not in self._valid_extensions:
             return False
         
-        if self.file_extensions is not None:
-            ext = os.path.splitext(path)[1].lower()
-            return ext in self.file_extensions
-        
-        return True
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return False
+        return stat.S_ISREG(st.st_mode)
     
     def _is_in_watched_folders(self, path: str) -> bool:
         """Check if the path is in one of the watched folders"""
-        path = Path(path).resolve()
-        for folder in self.watch_folders:
-            try:
-                path.relative_to(folder)
-                return True
-            except ValueError:
-                continue
-        return False
+        rp = self._realpath(os.fspath(path))
+        return rp in self._resolved_watch or rp.startswith(self._watch_prefixes)
     
     def start(self) -> None:
         """Start monitoring"""
@@ -74,6 +92,11 @@ class FileMonitor:
                 logger.warning("File monitor is already running")
                 return
             
+            # Start the debounce scheduler
+            self.stopped.clear()
+            self._scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
+            self._scheduler_thread.start()
+            
             # Create and start the observer
             self.observer = Observer()
             
@@ -98,17 +121,82 @@ class FileMonitor:
                 return
             
             self.stopped.set()
+            self._wake.set()
             self.observer.stop()
             self.observer.join()
             self.observer = None
+            
+            if self._scheduler_thread is not None:
+                self._scheduler_thread.join(timeout=5.0)
+                self._scheduler_thread = None
             logger.info("File monitoring stopped")
     
+    def _schedule_event(self, path: str, event_type: str) -> None:
+        """
+        Schedule a debounced event, replacing any pending one for the path
+        
+        Args:
+            path: File path
+            event_type: Event type (created or modified)
+        """
+        deadline = time.monotonic() + self.debounce_time
+        with self._pending_lock:
+            self._pending[path] = (deadline, event_type)
+            heapq.heappush(self._pending_heap, (deadline, path))
+            if self._pending_heap[0][1] == path:
+                self._wake.set()
+    
+    def _run_scheduler(self) -> None:
+        """Scheduler thread dispatching debounced events once they are due"""
+        while not self.stopped.is_set():
+            due = []
+            with self._pending_lock:
+                now = time.monotonic()
+                while self._pending_heap and self._pending_heap[0][0] <= now:
+                    deadline, path = heapq.heappop(self._pending_heap)
+                    # Superseded heap entries no longer match the pending deadline
+                    entry = self._pending.get(path)
+                    if entry is not None and entry[0] == deadline:
+                        del self._pending[path]
+                        due.append((path, entry[1]))
+                timeout = self._pending_heap[0][0] - now if self._pending_heap else None
+                self._wake.clear()
+            
+            if due:
+                for path, event_type in due:
+                    self._process_event(path, event_type)
+            else:
+                self._wake.wait(timeout)
+    
+    def _process_event(self, path: str, event_type: str) -> None:
+        """
+        Process a debounced event
+        
+        Args:
+            path: File path
+            event_type: Event type (created or modified)
+        """
+        # Avoid processing the same file multiple times simultaneously
+        if path in self.processing_files:
+            return
+        
+        self.processing_files.add(path)
+        try:
+            if event_type == 'created':
+                self.on_file_added(path)
+            elif event_type == 'modified':
+                self.on_file_modified(path)
+        except Exception as e:
+            logger.error(f"Error handling {event_type} event for {path}: {e}")
+        finally:
+            self.processing_files.remove(path)
+    
     def scan_existing_files(self) -> List[str]:
         """
         Scan existing files in watch folders
         
         Returns:
-            List of file paths
+            List of file paths (symlinked files resolved to their targets)
         """
         all_files = []
         
@@ -118,11 +206,30 @@ class FileMonitor:
                 continue
             
             logger.info(f"Scanning folder: {folder}")
-            for root, _, files in os.walk(str(folder)):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if self._is_valid_file(file_path):
-                        all_files.append(file_path)
+            valid_extensions = self._valid_extensions
+            stack = [str(folder)]
+            while stack:
+                directory = stack.pop()
+                try:
+                    entries = os.scandir(directory)
+                except OSError as e:
+                    logger.warning(f"Cannot scan directory {directory}: {e}")
+                    continue
+                
+                with entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif get_extension(entry.name) in valid_extensions and entry.is_file():
+                                # Report linked files by their target, the path
+                                # documents are stored under
+                                if entry.is_symlink():
+                                    all_files.append(os.path.realpath(entry.path))
+                                else:
+                                    all_files.append(entry.path)
+                        except OSError:
+                            continue
         
         logger.info(f"Found {len(all_files)} existing files")
         return all_files
@@ -139,9 +246,13 @@ class FileEventHandler(FileSystemEventHandler):
             file_monitor: File monitor instance
         """
         self.file_monitor = file_monitor
-        self.debounce_time = 1.0  # seconds
-        self.debounce_events = {}
         self.lock = threading.RLock()
+        
+        # Events for a path seen within recent_window seconds are dropped
+        # before touching the debounce scheduler
+        self.recent_window = 0.2  # seconds
+        self.recent_max_entries = 8192
+        self.recent_events: "OrderedDict[str, float]" = OrderedDict()
     
     def on_created(self, event: FileSystemEvent) -> None:
         """Handle file creation event"""
@@ -193,45 +304,16 @@ class FileEventHandler(FileSystemEventHandler):
             path: File path
             event_type: Event type (created or modified)
         """
-        if not self.file_monitor._is_valid_file(path):
-            return
-        
-        with self.lock:
-            # Cancel any pending timer for this path
-            if path in self.debounce_events:
-                self.debounce_events[path].cancel()
-            
-            # Create a new timer
-            timer = threading.Timer(
-                self.debounce_time,
-                self._process_event,
-                args=[path, event_type]
-            )
-            timer.daemon = True
-            self.debounce_events[path] = timer
-            timer.start()
-    
-    def _process_event(self, path: str, event_type: str) -> None:
-        """
-        Process a debounced event
-        
-        Args:
-            path: File path
-            event_type: Event type (created or modified)
-        """
+        now = time.monotonic()
         with self.lock:
-            if path in self.debounce_events:
-                del self.debounce_events[path]
+            if now - self.recent_events.get(path, float('-inf')) < self.recent_window:
+                return
+            self.recent_events[path] = now
+            self.recent_events.move_to_end(path)
+            if len(self.recent_events) > self.recent_max_entries:
+                self.recent_events.popitem(last=False)
         
-        # Avoid processing the same file multiple times simultaneously
-        if path in self.file_monitor.processing_files:
+        if not self.file_monitor._is_valid_file(path):
             return
         
-        self.file_monitor.processing_files.add(path)
-        try:
-            if event_type == 'created':
-                self.file_monitor.on_file_added(path)
-            elif event_type == 'modified':
-                self.file_monitor.on_file_modified(path)
-        finally:
-            self.file_monitor.processing_files.remove(path)
+        self.file_monitor._schedule_event(path, event_type)
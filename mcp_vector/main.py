@@ -7,14 +7,21 @@ import json
 import logging
 import argparse
 import asyncio
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Type, TypeVar
+try:
+    from typing import Annotated
+except ImportError:  # Python 3.8
+    from typing_extensions import Annotated
 from pathlib import Path
 import signal
+import orjson
+import msgspec
 import uvicorn
 from fastapi import FastAPI, Response, Request, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
 from .mcp.vector_handler import MCPVectorHandler
+from .file_handlers import shutdown_pool
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +35,7 @@ logger = logging.getLogger("mcp-vector")
 
 # Global variables
 mcp_handler = None
-app = FastAPI(title="MCP Vector Server")
+app = FastAPI(title="MCP Vector Server", default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -39,19 +46,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Largest number of results a single search may request
+MAX_TOP_K = 100
+
 # MCP Request models
-class VectorSearchRequest(BaseModel):
-    query: str = Field(..., description="Query string to search for")
-    top_k: int = Field(5, description="Number of results to return")
-    paths: Optional[List[str]] = Field(None, description="Optional list of specific paths to search within")
+class VectorSearchRequest(msgspec.Struct):
+    query: str  # Query string to search for
+    top_k: Annotated[int, msgspec.Meta(ge=1, le=MAX_TOP_K)] = 5  # Number of results to return
+    paths: Optional[List[str]] = None  # Optional list of specific paths to search within
+
+class VectorRunRequest(msgspec.Struct):
+    paths: Optional[List[str]] = None  # Optional list of specific paths to process
 
-class VectorRunRequest(BaseModel):
-    paths: Optional[List[str]] = Field(None, description="Optional list of specific paths to process")
+RequestT = TypeVar("RequestT", bound=msgspec.Struct)
+
+async def decode_request(request: Request, model: Type[RequestT]) -> RequestT:
+    """Decode and validate a JSON request body into a request struct"""
+    body = await request.body()
+    try:
+        return msgspec.json.decode(body or b"{}", type=model)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 # MCP Routes
 @app.post("/mcp/vector_search")
-async def mcp_vector_search(request: VectorSearchRequest):
+async def mcp_vector_search(raw_request: Request):
     """MCP endpoint for vector search"""
+    request = await decode_request(raw_request, VectorSearchRequest)
     global mcp_handler
     if not mcp_handler:
         raise HTTPException(status_code=503, detail="MCP handler not initialized")
@@ -82,8 +103,9 @@ async def mcp_vector_status():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/mcp/vector_run")
-async def mcp_vector_run(request: VectorRunRequest):
+async def mcp_vector_run(raw_request: Request):
     """MCP endpoint for running embedding on all files"""
+    request = await decode_request(raw_request, VectorRunRequest)
     global mcp_handler
     if not mcp_handler:
         raise HTTPException(status_code=503, detail="MCP handler not initialized")
@@ -97,8 +119,9 @@ async def mcp_vector_run(request: VectorRunRequest):
 
 # HTTP API Routes (non-MCP)
 @app.post("/api/vector/search")
-async def http_vector_search(request: VectorSearchRequest):
+async def http_vector_search(raw_request: Request):
     """HTTP API endpoint for vector search"""
+    request = await decode_request(raw_request, VectorSearchRequest)
     global mcp_handler
     if not mcp_handler:
         raise HTTPException(status_code=503, detail="MCP handler not initialized")
@@ -129,8 +152,9 @@ async def http_vector_status():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/vector/run")
-async def http_vector_run(request: VectorRunRequest):
+async def http_vector_run(raw_request: Request):
     """HTTP API endpoint for running embedding on all files"""
+    request = await decode_request(raw_request, VectorRunRequest)
     global mcp_handler
     if not mcp_handler:
         raise HTTPException(status_code=503, detail="MCP handler not initialized")
@@ -159,6 +183,7 @@ def parse_args():
     parser.add_argument("--model", type=str, help="Name of the embedding model")
     parser.add_argument("--db-path", type=str, help="Path to store the vector database")
     parser.add_argument("--watch-folder", action="append", help="Folder to watch (can be specified multiple times)")
+    parser.add_argument("--batch-size", type=int, help="Number of files embedded together")
     
     return parser.parse_args()
 
@@ -171,13 +196,19 @@ def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
         "db_path": os.environ.get("MCP_VECTOR_DB_PATH", os.path.expanduser("~/.mcp-vector/db")),
         "watch_folders": os.environ.get("MCP_VECTOR_WATCH_FOLDERS", "").split(";") if os.environ.get("MCP_VECTOR_WATCH_FOLDERS") else [],
         "supported_extensions": set(os.environ.get("MCP_VECTOR_EXTENSIONS", "").split(",")) if os.environ.get("MCP_VECTOR_EXTENSIONS") else None,
+        "batch_size": int(os.environ.get("MCP_VECTOR_BATCH_SIZE", "32")),
+        "index_type": os.environ.get("MCP_VECTOR_INDEX_TYPE", "hnsw"),
+        "quantization": os.environ.get("MCP_VECTOR_QUANTIZATION", "fp16"),
+        "device": os.environ.get("MCP_VECTOR_DEVICE", "auto"),
+        "precision": os.environ.get("MCP_VECTOR_PRECISION", "auto"),
+        "query_cache_size": int(os.environ.get("MCP_VECTOR_QUERY_CACHE_SIZE", "512")),
     }
     
     # Load from config file if specified
     if config_path and os.path.exists(config_path):
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                file_config = json.load(f)
+            with open(config_path, 'rb') as f:
+                file_config = orjson.loads(f.read())
                 
                 # Update config with file values
                 for key, value in file_config.items():
@@ -198,6 +229,7 @@ def setup_signal_handlers():
         logger.info(f"Received signal {sig}, shutting down...")
         if mcp_handler:
             mcp_handler.shutdown()
+        shutdown_pool()
         sys.exit(0)
     
     signal.signal(signal.SIGINT, handle_signal)
@@ -224,6 +256,8 @@ def main():
         config["db_path"] = args.db_path
     if args.watch_folder:
         config["watch_folders"] = args.watch_folder
+    if args.batch_size:
+        config["batch_size"] = args.batch_size
     
     # Ensure we have at least one watch folder
     if not config["watch_folders"]:
@@ -245,7 +279,13 @@ def main():
             model_name=config["model_name"],
             db_path=config["db_path"],
             watch_folders=config["watch_folders"],
-            supported_extensions=config["supported_extensions"]
+            supported_extensions=config["supported_extensions"],
+            batch_size=config["batch_size"],
+            index_type=config["index_type"],
+            quantization=config["quantization"],
+            device=config["device"],
+            precision=config["precision"],
+            query_cache_size=config["query_cache_size"]
         )
         logger.info("MCP handler initialized")
     except Exception as e:
@@ -253,7 +293,15 @@ def main():
         sys.exit(1)
     
     # Run the server
-    uvicorn.run(app, host=config["host"], port=config["port"])
+    # uvloop is POSIX-only; Windows stays on the default asyncio loop
+    uvicorn.run(
+        app,
+        host=config["host"],
+        port=config["port"],
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
+        log_level="info"
+    )
 
 if __name__ == "__main__":
     main()
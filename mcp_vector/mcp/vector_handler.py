@@ -3,12 +3,15 @@ MCP Implementation for vector search
 """
 import os
 import json
+import asyncio
 import logging
 import threading
 from typing import Dict, List, Any, Optional, Union, Set
 from pathlib import Path
 
 from ..utils.embedding import EmbeddingProcessor
+from ..utils.semantic_cache import SemanticCache
+from ..utils.doc_store import format_timestamp
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +22,13 @@ class MCPVectorHandler:
                  model_name: str,
                  db_path: str,
                  watch_folders: List[str],
-                 supported_extensions: Optional[Set[str]] = None):
+                 supported_extensions: Optional[Set[str]] = None,
+                 batch_size: int = 32,
+                 index_type: str = 'hnsw',
+                 quantization: str = 'fp16',
+                 device: str = 'auto',
+                 precision: str = 'auto',
+                 query_cache_size: int = 512):
         """
         Initialize the MCP Vector handler
         
@@ -28,17 +37,32 @@ class MCPVectorHandler:
             db_path: Path to store the vector database
             watch_folders: List of folders to monitor for changes
             supported_extensions: Set of supported file extensions (None for all)
+            batch_size: Maximum number of queued files embedded together
+            index_type: Vector index type ('hnsw', 'hnsw_sq' or 'ivfpq')
+            quantization: Vector storage type of quantized indexes ('fp16' or 'int8')
+            device: Torch device for the model ('auto' picks CUDA when available)
+            precision: Model weight precision ('fp32', 'fp16', 'bf16' or 'auto')
+            query_cache_size: Number of recent queries whose results are
+                reused for near-identical queries (0 to disable)
         """
         self.processor = EmbeddingProcessor(
             model_name=model_name,
             db_path=db_path,
             watch_folders=watch_folders,
-            supported_extensions=supported_extensions
+            supported_extensions=supported_extensions,
+            batch_size=batch_size,
+            index_type=index_type,
+            quantization=quantization,
+            device=device,
+            precision=precision
         )
         
         # Initialize the processor
         self.processor.initialize()
         
+        # Results of recent queries, keyed by query embedding
+        self.query_cache = SemanticCache(dim=self.processor.embedding_dim, capacity=query_cache_size)
+        
         # Start monitoring
         self.processor.start_monitoring()
         
@@ -59,21 +83,36 @@ class MCPVectorHandler:
         """
         logger.info(f"Vector search: '{query}', top_k={top_k}")
         
-        # Perform the search
-        results = self.processor.search(query, top_k=top_k)
-        
-        # Filter by paths if specified
-        if paths and results:
-            filtered_results = []
-            for result in results:
-                file_path = result.get('path', '')
-                for path in paths:
-                    if file_path.startswith(path):
-                        filtered_results.append(result)
-                        break
-            results = filtered_results
-        
-        # Format the response
+        if not self.processor.model:
+            results = []
+        else:
+            try:
+                # Encode off the event loop so other requests are served meanwhile
+                # (run_in_executor rather than asyncio.to_thread for Python 3.8)
+                loop = asyncio.get_running_loop()
+                query_embedding = await loop.run_in_executor(None, self.processor.encode_query, query)
+                
+                # Reuse the results of a near-identical recent query
+                cache_key = (top_k, tuple(paths) if paths else None)
+                db_version = self.processor.get_db_version()
+                results = self.query_cache.get(query_embedding, cache_key, db_version)
+                
+                if results is None:
+                    # Perform the search within the given paths
+                    results = self.processor.search_by_embedding(query_embedding, top_k=top_k, paths=paths)
+                    
+                    self.query_cache.put(query_embedding, cache_key, db_version, results)
+            except Exception as e:
+                logger.error(f"Error searching: {e}")
+                results = []
+        
+        # Format the response; timestamps are stored as epoch milliseconds
+        results = [
+            {**result,
+             'created_at': format_timestamp(result.get('created_at', 0)),
+             'updated_at': format_timestamp(result.get('updated_at', 0))}
+            for result in results
+        ]
         response = {
             'query': query,
             'top_k': top_k,
@@ -94,6 +133,7 @@ class MCPVectorHandler:
         
         # Get status from processor
         status = self.processor.get_status()
+        status['query_cache'] = self.query_cache.get_status()
         
         return status
     
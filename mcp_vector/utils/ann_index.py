@@ -0,0 +1,516 @@
+"""
+Approximate nearest neighbor index backends
+"""
+import logging
+from typing import Callable, Iterable, Optional, Tuple
+
+import hnswlib
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Supported index types and the quantizations of the faiss backend
+INDEX_TYPES = ('hnsw', 'hnsw_sq', 'ivfpq')
+QUANTIZATIONS = ('fp16', 'int8')
+
+# QT_8bit_direct_signed stores round(x) for x in [-128, 127]; unit vectors
+# are scaled into that range on the way in
+_INT8_SCALE = 127.0
+
+# Fraction of tombstoned positions at which a faiss HNSW index is rebuilt
+# from its live vectors
+COMPACT_FRACTION = 0.25
+
+# Vectors buffered (and searched exactly) before an IVF-PQ index is trained,
+# its PQ sub-quantizer count and probed lists per query
+IVFPQ_TRAIN_SIZE = 10000
+IVFPQ_SUBQUANTIZERS = 16
+IVFPQ_NPROBE = 16
+
+class FaissHNSWSQIndex:
+    """
+    HNSW index over scalar-quantized vectors (faiss IndexHNSWSQ)
+    
+    Exposes the subset of the hnswlib.Index interface used by
+    VectorDatabase, including its 1 - similarity distances. faiss HNSW indexes cannot
+    remove vectors, so deleted and replaced labels leave tombstoned
+    positions that are skipped at search time; the index is rebuilt from
+    its live vectors once they make up COMPACT_FRACTION of all positions.
+    """
+    
+    def __init__(self, space: str, dim: int, quantization: str = 'fp16'):
+        """
+        Initialize the index wrapper
+        
+        Args:
+            space: Distance space ('ip' or 'cosine')
+            dim: Dimension of the vectors
+            quantization: Storage type of the vectors ('fp16' or 'int8')
+        """
+        if space not in ('ip', 'cosine'):
+            raise ValueError(f"Unsupported space for quantized index: {space}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        
+        self.space = space
+        self.dim = dim
+        self.quantization = quantization
+        self._scale = _INT8_SCALE if quantization == 'int8' else 1.0
+        
+        self.index = None
+        self._max_elements = 0
+        # Label of each vector position and live position of each label
+        self._labels = np.empty(0, dtype=np.int64)
+        self._positions = {}
+        self._deleted = set()
+    
+    def _new_faiss_index(self, M: int, ef_construction: int):
+        """Create an empty faiss index with the configured quantization"""
+        if self.quantization == 'int8':
+            qtype = faiss.ScalarQuantizer.QT_8bit_direct_signed
+        else:
+            qtype = faiss.ScalarQuantizer.QT_fp16
+        
+        index = faiss.IndexHNSWSQ(self.dim, qtype, M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    
+    def init_index(self, max_elements: int, ef_construction: int = 200, M: int = 16, **kwargs) -> None:
+        """Create an empty index (faiss indexes grow without a capacity)"""
+        self.index = self._new_faiss_index(M, ef_construction)
+        self._max_elements = max_elements
+        self._labels = np.empty(0, dtype=np.int64)
+        self._positions = {}
+        self._deleted = set()
+    
+    def set_ef(self, ef: int) -> None:
+        """Set the search-time candidate list size"""
+        self.index.hnsw.efSearch = ef
+    
+    def get_max_elements(self) -> int:
+        """Get the nominal capacity (faiss indexes grow as needed)"""
+        return max(self._max_elements, len(self._labels))
+    
+    def resize_index(self, new_size: int) -> None:
+        """Record a new nominal capacity"""
+        self._max_elements = new_size
+    
+    def get_current_count(self) -> int:
+        """Get the number of stored vector positions, including tombstones"""
+        return len(self._labels)
+    
+    def _prepare(self, data: np.ndarray) -> np.ndarray:
+        """Normalize vectors for cosine space and scale them for storage"""
+        data = np.array(data, dtype=np.float32, ndmin=2, copy=True)
+        if self.space == 'cosine':
+            faiss.normalize_L2(data)
+        if self._scale != 1.0:
+            data *= self._scale
+        return data
+    
+    def add_items(self, data: np.ndarray, ids: Iterable[int], **kwargs) -> None:
+        """
+        Add vectors, replacing the vectors of labels that already exist
+        
+        Args:
+            data: Vectors, one per row
+            ids: Labels of the vectors
+        """
+        labels = np.asarray(ids, dtype=np.int64).reshape(-1)
+        start = len(self._labels)
+        
+        self.index.add(self._prepare(data))
+        self._labels = np.concatenate([self._labels, labels])
+        for offset, label in enumerate(labels.tolist()):
+            old = self._positions.get(label)
+            if old is not None:
+                self._deleted.add(old)
+            self._positions[label] = start + offset
+        self._compact_if_needed()
+    
+    def mark_deleted(self, label: int) -> None:
+        """Delete the vector of a label"""
+        position = self._positions.pop(int(label), None)
+        if position is None:
+            raise RuntimeError(f"Label not found: {label}")
+        self._deleted.add(position)
+        self._compact_if_needed()
+    
+    def _compact_if_needed(self) -> None:
+        """Rebuild the index without tombstones once there are many of them"""
+        if len(self._deleted) <= COMPACT_FRACTION * len(self._labels):
+            return
+        
+        positions = np.array(sorted(self._positions.values()), dtype=np.int64)
+        # Stored vectors come back already scaled, so they are added as is
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)[positions] if len(positions) \
+            else np.empty((0, self.dim), dtype=np.float32)
+        
+        hnsw = self.index.hnsw
+        index = self._new_faiss_index(hnsw.nb_neighbors(1), hnsw.efConstruction)
+        index.hnsw.efSearch = hnsw.efSearch
+        if len(positions):
+            index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        
+        self.index = index
+        self._labels = self._labels[positions]
+        self._positions = {label: position for position, label in enumerate(self._labels.tolist())}
+        self._deleted = set()
+        logger.info(f"Compacted quantized index to {len(positions)} vectors")
+    
+    def knn_query(self, data: np.ndarray, k: int = 1, filter: Optional[Callable[[int], bool]] = None,
+                  **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest live vectors of each query
+        
+        Args:
+            data: Query vectors, one per row
+            k: Number of neighbors to return
+            filter: Optional predicate on labels; only labels passing it are returned
+        
+        Returns:
+            Tuple of (labels, 1 - similarity distances) arrays of shape (n, k)
+        """
+        queries = self._prepare(data)
+        total = len(self._labels)
+        
+        labels = np.empty((len(queries), k), dtype=np.uint64)
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        for row in range(len(queries)):
+            # Widen the fetch while tombstones or a filter reject candidates
+            fetch = min(k, total)
+            while True:
+                similarities, positions = self.index.search(queries[row:row + 1], fetch)
+                found = 0
+                for similarity, position in zip(similarities[0], positions[0]):
+                    if position < 0 or position in self._deleted:
+                        continue
+                    label = int(self._labels[position])
+                    if filter is not None and not filter(label):
+                        continue
+                    labels[row, found] = label
+                    distances[row, found] = 1.0 - similarity / (self._scale * self._scale)
+                    found += 1
+                    if found == k:
+                        break
+                
+                if found == k or fetch >= total:
+                    break
+                fetch = min(fetch * 2, total)
+            
+            if found < k:
+                raise RuntimeError("Cannot return the results in a contiguous 2D array. Probably ef or M is too small")
+        
+        return labels, distances
+    
+    def get_items(self, ids: Iterable[int]) -> np.ndarray:
+        """
+        Get the stored (dequantized) vectors of labels
+        
+        Args:
+            ids: Labels of the vectors
+        
+        Returns:
+            Vectors, one per row
+        """
+        positions = [self._positions[int(label)] for label in ids]
+        if not positions:
+            return np.empty((0, self.dim), dtype=np.float32)
+        
+        vectors = np.vstack([self.index.reconstruct(position) for position in positions])
+        return vectors / self._scale
+    
+    def save_index(self, path: str) -> None:
+        """Save the index, labels and tombstones to a single file"""
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                index=faiss.serialize_index(self.index),
+                labels=self._labels,
+                deleted=np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+            )
+    
+    def load_index(self, path: str, max_elements: int = 0, **kwargs) -> None:
+        """Load an index saved by save_index"""
+        self._max_elements = max_elements
+        with np.load(path) as data:
+            self.index = faiss.deserialize_index(data['index'])
+            self._labels = data['labels'].astype(np.int64)
+            self._deleted = set(data['deleted'].tolist())
+        
+        self._positions = {}
+        for position, label in enumerate(self._labels.tolist()):
+            if position not in self._deleted:
+                self._positions[label] = position
+
+class FaissIVFPQIndex:
+    """
+    Inverted-file index over product-quantized vectors (faiss IndexIVFPQ)
+    
+    Exposes the same hnswlib.Index subset as FaissHNSWSQIndex. Vectors are
+    kept in an exact in-memory buffer until IVFPQ_TRAIN_SIZE of them exist;
+    the index is then trained on the buffer with sqrt(N) lists and stores
+    about IVFPQ_SUBQUANTIZERS bytes per vector from then on.
+    """
+    
+    def __init__(self, space: str, dim: int):
+        """
+        Initialize the index wrapper
+        
+        Args:
+            space: Distance space ('ip' or 'cosine')
+            dim: Dimension of the vectors
+        """
+        if space not in ('ip', 'cosine'):
+            raise ValueError(f"Unsupported space for quantized index: {space}")
+        
+        self.space = space
+        self.dim = dim
+        # Largest sub-quantizer count up to the default that divides dim
+        self.m = next(m for m in range(IVFPQ_SUBQUANTIZERS, 0, -1) if dim % m == 0)
+        self.nprobe = IVFPQ_NPROBE
+        
+        self.index = None
+        self._quantizer = None
+        self._max_elements = 0
+        # Untrained phase: label -> vector; trained phase: live labels
+        self._buffer = {}
+        self._labels = set()
+    
+    def init_index(self, max_elements: int, **kwargs) -> None:
+        """Create an empty, untrained index"""
+        self.index = None
+        self._max_elements = max_elements
+        self._buffer = {}
+        self._labels = set()
+    
+    def set_ef(self, ef: int) -> None:
+        """Accepted for interface compatibility; IVF search breadth is nprobe"""
+    
+    def get_max_elements(self) -> int:
+        """Get the nominal capacity (faiss indexes grow as needed)"""
+        return max(self._max_elements, self.get_current_count())
+    
+    def resize_index(self, new_size: int) -> None:
+        """Record a new nominal capacity"""
+        self._max_elements = new_size
+    
+    def get_current_count(self) -> int:
+        """Get the number of stored vectors"""
+        return len(self._labels) if self.index is not None else len(self._buffer)
+    
+    def _prepare(self, data: np.ndarray) -> np.ndarray:
+        """Convert vectors to float32 rows, normalized for cosine space"""
+        data = np.array(data, dtype=np.float32, ndmin=2, copy=True)
+        if self.space == 'cosine':
+            faiss.normalize_L2(data)
+        return data
+    
+    def _train(self) -> None:
+        """Train the index on the buffered vectors and move them into it"""
+        labels = np.fromiter(self._buffer, dtype=np.int64, count=len(self._buffer))
+        vectors = np.vstack(list(self._buffer.values()))
+        nlist = max(1, int(np.sqrt(len(labels))))
+        
+        quantizer = faiss.IndexFlatIP(self.dim)
+        index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, self.m, 8, faiss.METRIC_INNER_PRODUCT)
+        # Keep a label -> entry map so vectors can be replaced and reconstructed
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.train(vectors)
+        index.add_with_ids(vectors, labels)
+        index.nprobe = self.nprobe
+        # The coarse quantizer must outlive this method
+        self._quantizer = quantizer
+        
+        self.index = index
+        self._labels = set(labels.tolist())
+        self._buffer = {}
+        logger.info(f"Trained IVF-PQ index on {len(labels)} vectors with {nlist} lists")
+    
+    def add_items(self, data: np.ndarray, ids: Iterable[int], **kwargs) -> None:
+        """
+        Add vectors, replacing the vectors of labels that already exist
+        
+        Args:
+            data: Vectors, one per row
+            ids: Labels of the vectors
+        """
+        vectors = self._prepare(data)
+        labels = np.asarray(ids, dtype=np.int64).reshape(-1)
+        
+        if self.index is None:
+            for label, vector in zip(labels.tolist(), vectors):
+                self._buffer[label] = vector
+            if len(self._buffer) >= IVFPQ_TRAIN_SIZE:
+                self._train()
+            return
+        
+        replaced = [label for label in labels.tolist() if label in self._labels]
+        if replaced:
+            self.index.remove_ids(np.array(replaced, dtype=np.int64))
+        self.index.add_with_ids(vectors, labels)
+        self._labels.update(labels.tolist())
+    
+    def mark_deleted(self, label: int) -> None:
+        """Delete the vector of a label"""
+        label = int(label)
+        if self.index is None:
+            if self._buffer.pop(label, None) is None:
+                raise RuntimeError(f"Label not found: {label}")
+            return
+        
+        if label not in self._labels:
+            raise RuntimeError(f"Label not found: {label}")
+        self.index.remove_ids(np.array([label], dtype=np.int64))
+        self._labels.discard(label)
+    
+    def _search_buffer(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the untrained buffer exactly, returning faiss-style results"""
+        labels = np.fromiter(self._buffer, dtype=np.int64, count=len(self._buffer))
+        if not len(labels):
+            return np.empty((len(queries), 0), dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64)
+        
+        similarities = queries @ np.vstack(list(self._buffer.values())).T
+        k = min(k, len(labels))
+        top = np.argsort(-similarities, axis=1)[:, :k]
+        return np.take_along_axis(similarities, top, axis=1), labels[top]
+    
+    def knn_query(self, data: np.ndarray, k: int = 1, filter: Optional[Callable[[int], bool]] = None,
+                  **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest vectors of each query
+        
+        Args:
+            data: Query vectors, one per row
+            k: Number of neighbors to return
+            filter: Optional predicate on labels; only labels passing it are returned
+        
+        Returns:
+            Tuple of (labels, 1 - similarity distances) arrays of shape (n, k)
+        """
+        queries = self._prepare(data)
+        total = self.get_current_count()
+        
+        labels = np.empty((len(queries), k), dtype=np.uint64)
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        for row in range(len(queries)):
+            # Keep widening while a filter rejects candidates
+            fetch = min(k, total)
+            while True:
+                if self.index is None:
+                    similarities, found_labels = self._search_buffer(queries[row:row + 1], fetch)
+                else:
+                    similarities, found_labels = self.index.search(queries[row:row + 1], fetch)
+                found = 0
+                for similarity, label in zip(similarities[0], found_labels[0].tolist()):
+                    if label < 0:
+                        continue
+                    if filter is not None and not filter(label):
+                        continue
+                    labels[row, found] = label
+                    distances[row, found] = 1.0 - similarity
+                    found += 1
+                    if found == k:
+                        break
+                
+                if found == k or fetch >= total:
+                    break
+                fetch = min(fetch * 2, total)
+            
+            if found < k:
+                raise RuntimeError("Cannot return the results in a contiguous 2D array. Probably ef or M is too small")
+        
+        return labels, distances
+    
+    def get_items(self, ids: Iterable[int]) -> np.ndarray:
+        """
+        Get the stored vectors of labels (approximations once trained)
+        
+        Args:
+            ids: Labels of the vectors
+        
+        Returns:
+            Vectors, one per row
+        """
+        ids = [int(label) for label in ids]
+        if not ids:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if self.index is None:
+            return np.vstack([self._buffer[label] for label in ids])
+        return np.vstack([self.index.reconstruct(label) for label in ids])
+    
+    def save_index(self, path: str) -> None:
+        """Save the index or the untrained buffer to a single file"""
+        with open(path, 'wb') as f:
+            if self.index is None:
+                np.savez(
+                    f,
+                    buffer_labels=np.fromiter(self._buffer, dtype=np.int64, count=len(self._buffer)),
+                    buffer_vectors=np.vstack(list(self._buffer.values())) if self._buffer
+                    else np.empty((0, self.dim), dtype=np.float32)
+                )
+            else:
+                np.savez(
+                    f,
+                    index=faiss.serialize_index(self.index),
+                    labels=np.fromiter(self._labels, dtype=np.int64, count=len(self._labels))
+                )
+    
+    def load_index(self, path: str, max_elements: int = 0, **kwargs) -> None:
+        """Load an index saved by save_index"""
+        self._max_elements = max_elements
+        with np.load(path) as data:
+            if 'index' in data.files:
+                self.index = faiss.deserialize_index(data['index'])
+                self.index.nprobe = self.nprobe
+                self._labels = set(data['labels'].tolist())
+                self._buffer = {}
+            else:
+                self.index = None
+                self._labels = set()
+                self._buffer = dict(zip(data['buffer_labels'].tolist(), data['buffer_vectors']))
+
+def create_index(index_type: str, space: str, dim: int, quantization: str = 'fp16'):
+    """
+    Create an empty index object of the given type
+    
+    Args:
+        index_type: 'hnsw' (hnswlib, fp32), 'hnsw_sq' (faiss, scalar-quantized)
+            or 'ivfpq' (faiss, product-quantized)
+        space: Distance space
+        dim: Dimension of the vectors
+        quantization: Storage type for quantized indexes ('fp16' or 'int8')
+    
+    Returns:
+        Index object with the hnswlib.Index interface
+    """
+    if index_type == 'hnsw_sq':
+        return FaissHNSWSQIndex(space=space, dim=dim, quantization=quantization)
+    if index_type == 'ivfpq':
+        return FaissIVFPQIndex(space=space, dim=dim)
+    return hnswlib.Index(space=space, dim=dim)
+
+def resolve_index_type(index_type: Optional[str]) -> str:
+    """
+    Validate an index type, falling back to 'hnsw' when it is unusable
+    
+    Args:
+        index_type: Requested index type
+    
+    Returns:
+        Index type to use
+    """
+    index_type = index_type or 'hnsw'
+    if index_type not in INDEX_TYPES:
+        logger.warning(f"Unknown index type {index_type}, using hnsw")
+        return 'hnsw'
+    if index_type != 'hnsw' and not FAISS_AVAILABLE:
+        logger.warning(f"faiss is not installed, using hnsw instead of {index_type}")
+        return 'hnsw'
+    return index_type
@@ -0,0 +1,70 @@
+"""
+Splitting document text into token-bounded chunks for embedding
+"""
+import logging
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token, used when the tokenizer cannot report offsets
+CHARS_PER_TOKEN = 4
+
+def chunk_text(content: str, tokenizer: Any, max_tokens: int = 256, overlap: int = 32) -> List[str]:
+    """
+    Split text into overlapping chunks of at most max_tokens tokens
+
+    Chunk boundaries are taken from the tokenizer's character offsets, so
+    every chunk is a contiguous slice of the original text.
+
+    Args:
+        content: Text to split
+        tokenizer: Hugging Face tokenizer of the embedding model
+        max_tokens: Maximum number of tokens per chunk
+        overlap: Number of tokens shared by consecutive chunks
+
+    Returns:
+        List of chunk texts (the whole text if it fits in one chunk)
+    """
+    max_tokens = max(1, max_tokens)
+    step = max(1, max_tokens - overlap)
+
+    try:
+        encoding = tokenizer(
+            content,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        offsets = encoding['offset_mapping']
+    except (NotImplementedError, TypeError, KeyError) as e:
+        # Slow (Python) tokenizers do not provide offsets
+        logger.debug(f"Tokenizer offsets unavailable, chunking by characters: {e}")
+        return _chunk_by_chars(content, max_tokens * CHARS_PER_TOKEN, overlap * CHARS_PER_TOKEN)
+
+    if len(offsets) <= max_tokens:
+        return [content]
+
+    chunks = []
+    for start in range(0, len(offsets), step):
+        end = min(start + max_tokens, len(offsets))
+        chunks.append(content[offsets[start][0]:offsets[end - 1][1]])
+        if end == len(offsets):
+            break
+
+    return chunks
+
+def _chunk_by_chars(content: str, max_chars: int, overlap: int) -> List[str]:
+    """Split text into overlapping chunks of at most max_chars characters"""
+    if len(content) <= max_chars:
+        return [content]
+
+    step = max(1, max_chars - overlap)
+    chunks = []
+    for start in range(0, len(content), step):
+        chunks.append(content[start:start + max_chars])
+        if start + max_chars >= len(content):
+            break
+
+    return chunks
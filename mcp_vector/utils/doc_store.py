@@ -0,0 +1,371 @@
+"""
+Column-oriented storage of document metadata
+"""
+import operator
+import sqlite3
+import threading
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import orjson
+
+def timestamp_ms(value: Union[int, str, None]) -> int:
+    """
+    Convert a stored timestamp to epoch milliseconds
+    
+    Args:
+        value: Epoch milliseconds, or an ISO 8601 string written by older versions
+    
+    Returns:
+        Epoch milliseconds (0 if unknown)
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        if value.isdigit():
+            return int(value)
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    return int(value)
+
+def format_timestamp(ms: int) -> Optional[str]:
+    """
+    Format epoch milliseconds as a local ISO 8601 string
+    
+    Args:
+        ms: Epoch milliseconds
+    
+    Returns:
+        ISO 8601 string, or None if the timestamp is unknown
+    """
+    return datetime.fromtimestamp(ms / 1000).isoformat() if ms else None
+
+class DocStore(Mapping):
+    """
+    Document metadata kept in parallel lists indexed by document ID
+    
+    Behaves as a read-only mapping of document ID to a metadata dict, built
+    on access, so code reading metadata works as with a dict of dicts.
+    Each row is one chunk; fields shared by all chunks of a document (file
+    name, size, extractor fields, ...) are kept once per path. Deleted
+    documents leave a None path in their row.
+    """
+    
+    # Fields stored in the row columns rather than with the document
+    ROW_FIELDS = ('path', 'content_hash', 'created_at', 'updated_at', 'chunk_index')
+    
+    def __init__(self):
+        """Initialize an empty store"""
+        self.paths: List[Optional[str]] = []
+        self.content_hashes: List[Optional[str]] = []
+        # Epoch milliseconds, 0 in deleted rows
+        self.created = array('q')
+        self.updated = array('q')
+        self.chunk_indexes = array('l')
+        self._count = 0
+        
+        # Path -> remaining metadata fields shared by the document's chunks
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        
+        # Rows and paths changed since the store was last persisted
+        self.dirty = set()
+        self.dirty_paths = set()
+    
+    def __getitem__(self, doc_id: int) -> Dict[str, Any]:
+        # Accept numpy integers returned by index searches
+        doc_id = operator.index(doc_id)
+        if not 0 <= doc_id < len(self.paths) or self.paths[doc_id] is None:
+            raise KeyError(doc_id)
+        
+        path = self.paths[doc_id]
+        return {
+            'path': path,
+            'created_at': self.created[doc_id],
+            'updated_at': self.updated[doc_id],
+            **self.documents.get(path, {}),
+            'chunk_index': self.chunk_indexes[doc_id],
+            'content_hash': self.content_hashes[doc_id],
+        }
+    
+    def __contains__(self, doc_id: object) -> bool:
+        try:
+            doc_id = operator.index(doc_id)
+        except TypeError:
+            return False
+        return 0 <= doc_id < len(self.paths) and self.paths[doc_id] is not None
+    
+    def __iter__(self) -> Iterator[int]:
+        return (doc_id for doc_id, path in enumerate(self.paths) if path is not None)
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def _grow(self, size: int) -> None:
+        """Extend all columns to at least size rows"""
+        missing = size - len(self.paths)
+        if missing > 0:
+            for column in (self.paths, self.content_hashes):
+                column.extend([None] * missing)
+            for column in (self.created, self.updated, self.chunk_indexes):
+                column.extend([0] * missing)
+    
+    def put_document(self, path: str, metadata: Dict[str, Any]) -> None:
+        """
+        Store the metadata shared by all chunks of a document
+        
+        Args:
+            path: Path to the document
+            metadata: Document metadata; row fields such as content_hash are ignored
+        """
+        self.documents[path] = {key: value for key, value in metadata.items() if key not in self.ROW_FIELDS}
+        self.dirty_paths.add(path)
+    
+    def put_chunk(self, doc_id: int, path: str, chunk_index: int, content_hash: Optional[str],
+                  created_at: int, updated_at: int) -> None:
+        """
+        Store the row of a chunk
+        
+        Args:
+            doc_id: Document ID
+            path: Path to the document
+            chunk_index: Position of the chunk within the document
+            content_hash: Hash of the document content
+            created_at: Creation time in epoch milliseconds
+            updated_at: Update time in epoch milliseconds
+        """
+        self._grow(doc_id + 1)
+        if self.paths[doc_id] is None:
+            self._count += 1
+        
+        self.paths[doc_id] = path
+        self.content_hashes[doc_id] = content_hash
+        self.created[doc_id] = created_at
+        self.updated[doc_id] = updated_at
+        self.chunk_indexes[doc_id] = chunk_index
+        self.dirty.add(doc_id)
+    
+    def put(self, doc_id: int, path: str, metadata: Dict[str, Any], created_at: int, updated_at: int) -> None:
+        """
+        Store a chunk from a full metadata dict, as written by older versions
+        
+        Args:
+            doc_id: Document ID
+            path: Path to the document
+            metadata: Metadata of the chunk, including document fields
+            created_at: Creation time in epoch milliseconds
+            updated_at: Update time in epoch milliseconds
+        """
+        if path not in self.documents:
+            self.put_document(path, metadata)
+        self.put_chunk(doc_id, path, metadata.get('chunk_index', 0), metadata.get('content_hash'),
+                       timestamp_ms(metadata.get('created_at', created_at)),
+                       timestamp_ms(metadata.get('updated_at', updated_at)))
+    
+    def delete(self, doc_id: int) -> None:
+        """
+        Delete the row of a chunk
+        
+        Args:
+            doc_id: Document ID
+        """
+        if doc_id in self:
+            self.paths[doc_id] = None
+            self.content_hashes[doc_id] = None
+            self.created[doc_id] = 0
+            self.updated[doc_id] = 0
+            self.chunk_indexes[doc_id] = 0
+            self._count -= 1
+            self.dirty.add(doc_id)
+    
+    def delete_document(self, path: str) -> None:
+        """
+        Delete the shared metadata of a document whose chunks were deleted
+        
+        Args:
+            path: Path to the document
+        """
+        if self.documents.pop(path, None) is not None:
+            self.dirty_paths.add(path)
+    
+    def path_to_ids(self) -> Dict[str, List[int]]:
+        """
+        Build the mapping of path to the IDs of its chunks
+        
+        Returns:
+            Dictionary of path to document IDs in ascending order
+        """
+        mapping: Dict[str, List[int]] = {}
+        for doc_id, path in enumerate(self.paths):
+            if path is not None:
+                mapping.setdefault(path, []).append(doc_id)
+        return mapping
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List[Any]]) -> "DocStore":
+        """
+        Create a store from the serialized columns of older versions
+        
+        Args:
+            columns: Dictionary of column name to column values
+        
+        Returns:
+            Document store
+        """
+        store = cls()
+        for doc_id, path in enumerate(columns['path']):
+            if path is not None:
+                store.put(doc_id, path,
+                          {**(columns['extra'][doc_id] or {}), 'content_hash': columns['content_hash'][doc_id]},
+                          columns['created_at'][doc_id], columns['updated_at'][doc_id])
+        return store
+    
+    @classmethod
+    def from_dict(cls, metadata: Dict[int, Dict[str, Any]]) -> "DocStore":
+        """
+        Create a store from the legacy document ID to metadata dict
+        
+        Args:
+            metadata: Dictionary of document ID to metadata
+        
+        Returns:
+            Document store
+        """
+        store = cls()
+        for doc_id, document in metadata.items():
+            store.put(int(doc_id), document['path'], document,
+                      document.get('created_at'), document.get('updated_at'))
+        return store
+
+class MetadataDB:
+    """
+    Persist a DocStore in SQLite, writing only the rows that changed
+    
+    Chunk rows are stored in the docs table and the shared metadata of each
+    document once in the documents table. Older databases kept the full
+    metadata in the extra column of every row; such rows are converted on
+    load and rewritten by the next save.
+    """
+    
+    def __init__(self, db_file: str):
+        """
+        Open the metadata database
+        
+        Args:
+            db_file: Path to the SQLite database file
+        """
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "id INTEGER PRIMARY KEY, path TEXT, content_hash TEXT, "
+                "created_at INTEGER, updated_at INTEGER, extra BLOB, chunk_index INTEGER)"
+            )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(docs)")}
+            if 'chunk_index' not in columns:
+                self.conn.execute("ALTER TABLE docs ADD COLUMN chunk_index INTEGER")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, extra BLOB)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            self.conn.commit()
+    
+    def is_empty(self) -> bool:
+        """Check whether the database has never been written"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'current_id'").fetchone()
+        return row is None
+    
+    def load(self) -> Tuple[DocStore, Dict[str, Any]]:
+        """
+        Load the stored documents
+        
+        Returns:
+            Tuple of (document store, database values such as current_id)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, path, content_hash, created_at, updated_at, chunk_index, extra FROM docs ORDER BY id"
+            ).fetchall()
+            documents = self.conn.execute("SELECT path, extra FROM documents").fetchall()
+            meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        
+        store = DocStore()
+        store.documents = {path: orjson.loads(extra) for path, extra in documents}
+        if rows:
+            store._grow(rows[-1][0] + 1)
+        for doc_id, path, content_hash, created_at, updated_at, chunk_index, extra in rows:
+            store.paths[doc_id] = path
+            store.content_hashes[doc_id] = content_hash
+            store.created[doc_id] = timestamp_ms(created_at)
+            store.updated[doc_id] = timestamp_ms(updated_at)
+            if extra is not None:
+                # Row of an older version with the full metadata
+                extra = orjson.loads(extra)
+                chunk_index = extra.get('chunk_index', 0)
+                if path not in store.documents:
+                    store.put_document(path, extra)
+                store.dirty.add(doc_id)
+            store.chunk_indexes[doc_id] = chunk_index or 0
+        store._count = len(rows)
+        
+        meta.setdefault('current_id', len(store.paths))
+        return store, meta
+    
+    def save(self, store: DocStore, meta: Dict[str, Any]) -> None:
+        """
+        Write the rows changed since the last save
+        
+        Args:
+            store: Document store
+            meta: Database values to store, including current_id (next document ID)
+        """
+        upserts = []
+        deletes = []
+        for doc_id in store.dirty:
+            if doc_id in store:
+                upserts.append((
+                    doc_id, store.paths[doc_id], store.content_hashes[doc_id],
+                    store.created[doc_id], store.updated[doc_id], store.chunk_indexes[doc_id]
+                ))
+            else:
+                deletes.append((doc_id,))
+        
+        document_upserts = []
+        document_deletes = []
+        for path in store.dirty_paths:
+            if path in store.documents:
+                document_upserts.append((path, orjson.dumps(store.documents[path])))
+            else:
+                document_deletes.append((path,))
+        
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO docs (id, path, content_hash, created_at, updated_at, chunk_index, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                upserts
+            )
+            self.conn.executemany("DELETE FROM docs WHERE id = ?", deletes)
+            self.conn.executemany("INSERT OR REPLACE INTO documents (path, extra) VALUES (?, ?)", document_upserts)
+            self.conn.executemany("DELETE FROM documents WHERE path = ?", document_deletes)
+            self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(meta.items()))
+            self.conn.commit()
+        
+        store.dirty.clear()
+        store.dirty_paths.clear()
+    
+    def clear(self) -> None:
+        """Remove all stored documents"""
+        with self.lock:
+            self.conn.execute("DELETE FROM docs")
+            self.conn.execute("DELETE FROM documents")
+            self.conn.execute("DELETE FROM meta")
+            self.conn.commit()
+    
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self.lock:
+            self.conn.close()
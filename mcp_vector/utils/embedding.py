@@ -2,20 +2,36 @@
 Document embedding processing
 """
 import os
+import queue
 import logging
 import threading
 import numpy as np
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Tuple
 from pathlib import Path
 import hashlib
+import torch
 from sentence_transformers import SentenceTransformer
 
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
 from ..utils.vector_db import VectorDatabase
-from ..file_handlers.extractors import extract_file_content
+from ..utils.file_state import FileStateCache
+from ..utils.chunking import chunk_text
+from ..utils.path_filter import PathPrefixMatcher
+from ..utils.embedding_cache import EmbeddingCache
+from ..file_handlers.extractors import iter_extract_file_content
 from ..file_handlers.monitor import FileMonitor
 
 logger = logging.getLogger(__name__)
 
+# Chunk vectors of recently embedded content kept for reuse by files with
+# identical content
+EMBEDDING_CACHE_SIZE = int(os.environ.get("MCP_VECTOR_EMBEDDING_CACHE_SIZE", "10000"))
+
 class EmbeddingProcessor:
     """Process documents for embedding and vector search"""
     
@@ -23,7 +39,12 @@ class EmbeddingProcessor:
                  model_name: str, 
                  db_path: str,
                  watch_folders: List[str],
-                 supported_extensions: Optional[Set[str]] = None):
+                 supported_extensions: Optional[Set[str]] = None,
+                 batch_size: int = 32,
+                 index_type: str = 'hnsw',
+                 quantization: str = 'fp16',
+                 device: str = 'auto',
+                 precision: str = 'auto'):
         """
         Initialize the embedding processor
         
@@ -32,8 +53,19 @@ class EmbeddingProcessor:
             db_path: Path to store the vector database
             watch_folders: List of folders to monitor for changes
             supported_extensions: Set of supported file extensions (None for all)
+            batch_size: Maximum number of queued files embedded together
+            index_type: Vector index type ('hnsw', 'hnsw_sq' or 'ivfpq')
+            quantization: Vector storage type of quantized indexes ('fp16' or 'int8')
+            device: Torch device for the model ('auto' picks CUDA when available)
+            precision: Model weight precision ('fp32', 'fp16', 'bf16' or 'auto'
+                for fp16 on CUDA and fp32 otherwise)
         """
         self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.index_type = index_type
+        self.quantization = quantization
+        self.device = device
+        self.precision = precision
         self.db_path = Path(db_path).resolve()
         self.watch_folders = [Path(folder).resolve() for folder in watch_folders]
         
@@ -54,20 +86,38 @@ class EmbeddingProcessor:
         # Initialize vector database
         self.vector_db = None
         
+        # Size/mtime/hash of processed files for skipping unchanged ones
+        self.file_state = None
+        
         # Initialize embedding model
         self.model = None
         
+        # Chunk embeddings by content hash
+        self.embedding_cache = None
+        
+        # Tokens shared by consecutive chunks of a document, and chunks per
+        # forward pass
+        self.chunk_overlap = 32
+        self.encode_batch_size = 64
+        
         # File monitor
         self.file_monitor = None
         
         # Processing lock
         self.lock = threading.RLock()
         
-        # Process queue
-        self.process_queue = []
-        self.queue_lock = threading.RLock()
-        self.queue_event = threading.Event()
+        # Process queue and the set of paths waiting in it
+        self.process_queue: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self.queued_paths: Set[str] = set()
+        self.queued_lock = threading.Lock()
         self.queue_thread = None
+        
+        # Extracted documents waiting for the encoder thread, as
+        # (path, stat result, quick hash, content, metadata); bounded so extraction
+        # cannot run far ahead of encoding
+        self.encode_queue: "queue.Queue[Tuple[str, Optional[os.stat_result], Optional[bytes], str, Dict[str, Any]]]" = \
+            queue.Queue(maxsize=2 * self.batch_size)
+        self.encode_thread = None
         self.running = False
     
     def initialize(self) -> None:
@@ -80,7 +130,7 @@ class EmbeddingProcessor:
         # Load embedding model first to get dimension
         logger.info(f"Loading embedding model: {self.model_name}")
         try:
-            self.model = SentenceTransformer(self.model_name)
+            self.model = self._load_model()
             self.embedding_dim = self.model.get_sentence_embedding_dimension()
             logger.info(f"Model loaded with embedding dimension: {self.embedding_dim}")
         except Exception as e:
@@ -90,11 +140,27 @@ class EmbeddingProcessor:
         # Now load vector database with correct dimension
         logger.info(f"Loading vector database from {self.db_path}")
         try:
-            self.vector_db = VectorDatabase(str(self.db_path), embedding_dim=self.embedding_dim)
+            self.vector_db = VectorDatabase(
+                str(self.db_path),
+                embedding_dim=self.embedding_dim,
+                index_type=self.index_type,
+                quantization=self.quantization
+            )
         except Exception as e:
             logger.error(f"Error loading vector database: {e}")
             raise
         
+        self.file_state = FileStateCache(str(self.db_path / "file_state.sqlite"))
+        # File states are written only together with the embeddings they describe
+        self.vector_db.on_saved = self.file_state.flush
+        
+        # Cached embeddings are only valid for the same model and chunking
+        self.embedding_cache = EmbeddingCache(
+            str(self.db_path / "embedding_cache.npz"),
+            signature=f"{self.model_name}|{self.model.max_seq_length}|{self.chunk_overlap}",
+            max_vectors=EMBEDDING_CACHE_SIZE
+        )
+        
         # Initialize file monitor
         self.file_monitor = FileMonitor(
             watch_folders=[str(folder) for folder in self.watch_folders],
@@ -104,19 +170,49 @@ class EmbeddingProcessor:
             file_extensions=self.supported_extensions
         )
         
-        # Start queue processing thread
+        # Start the extraction and encoder threads (once, even if initialized again)
         self.running = True
-        self.queue_thread = threading.Thread(target=self._process_queue_worker, daemon=True)
-        self.queue_thread.start()
+        if self.queue_thread is None or not self.queue_thread.is_alive():
+            self.queue_thread = threading.Thread(target=self._process_queue_worker, daemon=True)
+            self.queue_thread.start()
+        if self.encode_thread is None or not self.encode_thread.is_alive():
+            self.encode_thread = threading.Thread(target=self._encode_queue_worker, daemon=True)
+            self.encode_thread.start()
         
         logger.info("Embedding processor initialized")
+    
+    def _load_model(self) -> SentenceTransformer:
+        """
+        Load the embedding model on the configured device and precision
         
-        # Start queue processing thread
-        self.running = True
-        self.queue_thread = threading.Thread(target=self._process_queue_worker, daemon=True)
-        self.queue_thread.start()
-        
-        logger.info("Embedding processor initialized")
+        Returns:
+            Loaded model
+        """
+        device = self.device
+        if device == 'auto':
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        
+        precision = self.precision
+        if precision == 'auto':
+            precision = 'fp16' if device.startswith('cuda') else 'fp32'
+        elif precision != 'fp32' and not device.startswith('cuda'):
+            # Half-precision matmuls are slow or unsupported on most CPUs
+            logger.warning(f"Precision {precision} is only used on CUDA devices, using fp32 on {device}")
+            precision = 'fp32'
+        
+        model = SentenceTransformer(self.model_name, device=device)
+        if precision == 'fp16':
+            model = model.half()
+        elif precision == 'bf16':
+            model = model.to(torch.bfloat16)
+        
+        logger.info(f"Embedding model on {device} with {precision} weights")
+        return model
+    
+    def _encode(self, sentences, **kwargs) -> np.ndarray:
+        """Run the model without autograd bookkeeping"""
+        with torch.inference_mode():
+            return self.model.encode(sentences, show_progress_bar=False, **kwargs)
     
     def start_monitoring(self) -> None:
         """Start file system monitoring"""
@@ -130,7 +226,10 @@ class EmbeddingProcessor:
     
     def _get_content_hash(self, content: str) -> str:
         """Get hash of content to detect changes"""
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        if XXHASH_AVAILABLE:
+            # xxhash encodes str to UTF-8 in C, without a Python bytes copy
+            return xxhash.xxh3_128_hexdigest(content)
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
     
     def process_file(self, file_path: str) -> None:
         """
@@ -139,82 +238,214 @@ class EmbeddingProcessor:
         Args:
             file_path: Path to the file
         """
-        with self.queue_lock:
-            # Add to processing queue
-            if file_path not in self.process_queue:
-                self.process_queue.append(file_path)
-                self.queue_event.set()
+        # Add to processing queue unless it is already waiting there
+        with self.queued_lock:
+            if file_path in self.queued_paths:
+                return
+            self.queued_paths.add(file_path)
+        
+        self.process_queue.put(file_path)
     
     def _process_queue_worker(self) -> None:
-        """Worker thread for processing queued files"""
+        """Worker thread extracting queued files for the encoder thread"""
         while self.running:
             # Wait for items in the queue
-            self.queue_event.wait(timeout=1.0)
+            try:
+                batch = [self.process_queue.get(timeout=1.0)]
+            except queue.Empty:
+                continue
+            
+            # Take up to batch_size items from the queue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.process_queue.get_nowait())
+                except queue.Empty:
+                    break
             
-            # Get next item from queue
-            file_path = None
-            with self.queue_lock:
-                if self.process_queue:
-                    file_path = self.process_queue.pop(0)
-                
-                if not self.process_queue:
-                    self.queue_event.clear()
+            # Files changed from now on are queued again
+            with self.queued_lock:
+                self.queued_paths.difference_update(batch)
+            
+            # Extract the files
+            try:
+                self._extract_files(batch)
+            except Exception as e:
+                logger.error(f"Error extracting batch of {len(batch)} files: {e}")
+    
+    def _encode_queue_worker(self) -> None:
+        """Worker thread embedding extracted files and writing them to the database"""
+        while self.running:
+            try:
+                batch = [self.encode_queue.get(timeout=1.0)]
+            except queue.Empty:
+                # Flush pending writes once the pipeline is drained
+                self._save_database(min_interval=0.0)
+                self.embedding_cache.save()
+                continue
             
-            # Process the file
-            if file_path:
+            while len(batch) < self.batch_size:
                 try:
-                    self._process_file_internal(file_path)
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {e}")
+                    batch.append(self.encode_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self._embed_files(batch)
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(batch)} files: {e}")
+            
+            # Save periodically during bulk processing
+            self._save_database()
     
-    def _process_file_internal(self, file_path: str) -> None:
+    def _save_database(self, min_interval: float = 5.0) -> None:
         """
-        Internal method to process a file for embedding
+        Save the vector database if it has enough unsaved writes
         
         Args:
-            file_path: Path to the file
+            min_interval: Seconds since the last save after which to save
         """
-        file_path = str(Path(file_path).resolve())
-        logger.info(f"Processing file: {file_path}")
-        
         try:
-            # Extract content
-            content, metadata = extract_file_content(file_path)
+            self.vector_db.save_if_needed(min_interval=min_interval)
+        except Exception as e:
+            logger.error(f"Error saving vector database: {e}")
+    
+    def _extract_files(self, file_paths: List[str]) -> None:
+        """
+        Extract the content of a batch of files and pass it to the encoder thread
+        
+        Args:
+            file_paths: Paths to the files
+        """
+        # Skip files whose size/mtime (or quick hash) match the last run
+        pending = []
+        seen = set()
+        for file_path in file_paths:
+            file_path = os.path.realpath(file_path)
+            # Links to the same file resolve to one path
+            if file_path in seen:
+                continue
+            seen.add(file_path)
+            logger.info(f"Processing file: {file_path}")
             
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                st = None
+            if st is not None and self.vector_db.has_document(file_path) and self.file_state.is_unchanged(file_path, st):
+                logger.info(f"File unchanged since last processing: {file_path}")
+                continue
+            # Hash now, with the stat, rather than after encoding when the
+            # file may already hold newer content
+            digest = self.file_state.digest(file_path, st) if st is not None else None
+            pending.append((file_path, st, digest))
+        
+        if not pending:
+            return
+        
+        # Extract content in the extraction worker processes, handing each
+        # file to the encoder as soon as it is done
+        for i, (content, metadata) in iter_extract_file_content([file_path for file_path, _, _ in pending]):
+            file_path, st, digest = pending[i]
             if not content:
                 logger.warning(f"No content extracted from file: {file_path}")
-                return
+                continue
             
+            item = (file_path, st, digest, content, metadata)
+            while self.running:
+                try:
+                    self.encode_queue.put(item, timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+    
+    def _embed_files(self, items: List[Tuple[str, Optional[os.stat_result], Optional[bytes], str, Dict[str, Any]]]) -> None:
+        """
+        Embed a batch of extracted files and store them in the database
+        
+        Args:
+            items: (path, stat result, quick hash, content, metadata) tuples from _extract_files
+        """
+        # A file extracted twice before being embedded keeps its latest
+        # content; every path may occur only once per database batch
+        latest = {item[0]: item for item in items}
+        
+        paths, contents, metadatas, states = [], [], [], []
+        for file_path, st, digest, content, metadata in latest.values():
             # Calculate content hash
             content_hash = self._get_content_hash(content)
             
-            # Check if file exists in database with same hash
-            existing_docs = self.vector_db.get_document_paths()
-            if file_path in existing_docs:
-                # Check if we already have this version
-                existing_metadata = next((m for i, m in self.vector_db.metadata.items() 
-                                         if m['path'] == file_path), {})
-                
-                if existing_metadata.get('content_hash') == content_hash:
-                    logger.info(f"File already processed with same content: {file_path}")
-                    return
-            
-            # Generate embedding
-            embedding = self.model.encode(content, show_progress_bar=False)
+            # Check if we already have this version
+            existing_metadata = self.vector_db.get_metadata_by_path(file_path)
+            if existing_metadata is not None and existing_metadata.get('content_hash') == content_hash:
+                logger.info(f"File already processed with same content: {file_path}")
+                if st is not None:
+                    self.file_state.update(file_path, st, digest)
+                continue
             
             # Add metadata
             metadata['content_hash'] = content_hash
             metadata['content_length'] = len(content)
             
-            # Store in vector database
-            self.vector_db.add_document(file_path, embedding, metadata)
+            paths.append(file_path)
+            contents.append(content)
+            metadatas.append(metadata)
+            states.append((st, digest))
+        
+        if not paths:
+            return
+        
+        # Embed each distinct content once; copies in this batch and content
+        # embedded before reuse the cached chunk vectors
+        hashes = [metadata['content_hash'] for metadata in metadatas]
+        cached = {}
+        to_embed = {}
+        for content_hash, content in zip(hashes, contents):
+            if content_hash in cached or content_hash in to_embed:
+                continue
+            embeddings = self.embedding_cache.get(content_hash)
+            if embeddings is not None:
+                cached[content_hash] = embeddings
+            else:
+                to_embed[content_hash] = content
+        
+        if to_embed:
+            # Split documents into chunks the model can embed without truncation
+            # (its sequence limit minus the special tokens it adds)
+            max_tokens = self.model.max_seq_length - 2
+            chunks, chunk_counts = [], []
+            for content in to_embed.values():
+                file_chunks = chunk_text(content, self.model.tokenizer, max_tokens=max_tokens, overlap=self.chunk_overlap)
+                chunks.extend(file_chunks)
+                chunk_counts.append(len(file_chunks))
             
-            # Save database after each update
-            self.vector_db.save()
+            # Generate all embeddings in one call; encode() already orders the
+            # inputs by length internally to keep padding per batch small
+            new_embeddings = self._encode(
+                chunks,
+                batch_size=self.encode_batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
             
+            start = 0
+            for content_hash, count in zip(to_embed, chunk_counts):
+                cached[content_hash] = new_embeddings[start:start + count]
+                self.embedding_cache.put(content_hash, cached[content_hash])
+                start += count
+        
+        chunk_counts = []
+        for content_hash, metadata in zip(hashes, metadatas):
+            metadata['chunk_count'] = len(cached[content_hash])
+            chunk_counts.append(len(cached[content_hash]))
+        embeddings = np.concatenate([cached[content_hash] for content_hash in hashes])
+        
+        # Store in vector database
+        self.vector_db.add_documents_batch(paths, embeddings, metadatas, chunk_counts)
+        
+        for file_path, (st, digest) in zip(paths, states):
+            if st is not None:
+                self.file_state.update(file_path, st, digest)
             logger.info(f"File processed successfully: {file_path}")
-        except Exception as e:
-            logger.error(f"Error processing file {file_path}: {e}")
     
     def delete_file(self, file_path: str) -> None:
         """
@@ -223,16 +454,16 @@ class EmbeddingProcessor:
         Args:
             file_path: Path to the file
         """
-        file_path = str(Path(file_path).resolve())
+        file_path = os.path.realpath(file_path)
         logger.info(f"Deleting file from database: {file_path}")
         
         try:
             # Delete from vector database
             deleted = self.vector_db.delete_document(file_path)
+            self.file_state.remove(file_path)
             
             if deleted:
-                # Save database after each update
-                self.vector_db.save()
+                # Saved by the queue worker once it is idle
                 logger.info(f"File deleted from database: {file_path}")
             else:
                 logger.info(f"File not found in database: {file_path}")
@@ -245,26 +476,52 @@ class EmbeddingProcessor:
             logger.error("File monitor not initialized")
             return
         
+        # Get existing documents in database before scanning, so files the
+        # watcher adds during the scan are never swept as missing
+        existing_docs = self.vector_db.get_document_paths()
+        
         # Get list of all files
-        all_files = self.file_monitor.scan_existing_files()
+        all_files = set(self.file_monitor.scan_existing_files())
+        
+        # Add the files not already waiting to the queue; stored files are
+        # queued too, as they may have changed while the server was stopped
+        with self.queued_lock:
+            new_files = all_files - self.queued_paths
+            self.queued_paths |= new_files
+        for file_path in new_files:
+            self.process_queue.put(file_path)
+        
+        # Delete stored files the scan no longer found, limited to folders
+        # that were actually scanned so an unmounted folder keeps its documents
+        scanned = PathPrefixMatcher(
+            os.path.join(os.path.realpath(folder), '') for folder in self.watch_folders if folder.is_dir()
+        )
+        for doc_path in existing_docs - all_files:
+            if scanned(doc_path):
+                self.delete_file(doc_path)
         
-        # Get existing documents in database
-        existing_docs = self.vector_db.get_document_paths()
+        logger.info(f"Added {len(new_files)} files to processing queue")
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Generate the embedding of a search query
         
-        # Add files to queue
-        with self.queue_lock:
-            for file_path in all_files:
-                if file_path not in self.process_queue:
-                    self.process_queue.append(file_path)
-            
-            # Find and delete files that no longer exist
-            for doc_path in existing_docs:
-                if not os.path.exists(doc_path):
-                    self.delete_file(doc_path)
-            
-            self.queue_event.set()
+        Args:
+            query: Query string
         
-        logger.info(f"Added {len(all_files)} files to processing queue")
+        Returns:
+            Unit-length query embedding
+        """
+        return self._encode(query, normalize_embeddings=True)
+    
+    def get_db_version(self) -> int:
+        """
+        Get the version of the vector database, incremented on every write
+        
+        Returns:
+            Database version
+        """
+        return self.vector_db.version if self.vector_db else 0
     
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -273,7 +530,7 @@ class EmbeddingProcessor:
         Args:
             query: Query string
             top_k: Number of results to return
-            
+        
         Returns:
             List of matching documents with metadata
         """
@@ -283,10 +540,33 @@ class EmbeddingProcessor:
         
         try:
             # Generate query embedding
-            query_embedding = self.model.encode(query, show_progress_bar=False)
-            
+            query_embedding = self.encode_query(query)
+        except Exception as e:
+            logger.error(f"Error searching: {e}")
+            return []
+        
+        return self.search_by_embedding(query_embedding, top_k=top_k)
+    
+    def search_by_embedding(self, query_embedding: np.ndarray, top_k: int = 5,
+                            paths: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for documents matching a query embedding
+        
+        Args:
+            query_embedding: Query embedding from encode_query
+            top_k: Number of results to return
+            paths: Optional path prefixes to restrict the search to
+        
+        Returns:
+            List of matching documents with metadata
+        """
+        if not self.vector_db:
+            logger.error("Embedding processor not initialized")
+            return []
+        
+        try:
             # Search vector database
-            results = self.vector_db.search(query_embedding, top_k=top_k)
+            results = self.vector_db.search(query_embedding, top_k=top_k, paths=paths)
             
             return results
         except Exception as e:
@@ -309,6 +589,9 @@ class EmbeddingProcessor:
         if self.vector_db:
             status['vector_database'] = self.vector_db.get_status()
         
+        if self.embedding_cache:
+            status['embedding_cache'] = self.embedding_cache.get_status()
+        
         if self.model:
             status['embedding_dimension'] = self.embedding_dim
         
@@ -320,8 +603,9 @@ class EmbeddingProcessor:
         
         # Stop queue processing
         self.running = False
-        if self.queue_thread and self.queue_thread.is_alive():
-            self.queue_thread.join(timeout=5.0)
+        for thread in (self.queue_thread, self.encode_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=5.0)
         
         # Stop file monitoring
         self.stop_monitoring()
@@ -329,5 +613,12 @@ class EmbeddingProcessor:
         # Save vector database
         if self.vector_db:
             self.vector_db.save()
+            self.vector_db.close()
+        
+        if self.embedding_cache:
+            self.embedding_cache.save()
+        
+        if self.file_state:
+            self.file_state.close()
         
         logger.info("Embedding processor shut down")
@@ -0,0 +1,154 @@
+"""
+Cache of document chunk embeddings keyed by content hash
+"""
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Reuse the chunk embeddings of documents whose content was embedded before
+    
+    Files with identical content (copied READMEs, templated configs,
+    vendored code) share one entry. The cache is bounded by the total
+    number of chunk vectors, evicts least recently used documents first and
+    is persisted to a single npz file tagged with a signature of the model
+    and chunking settings, so a changed model never reuses old vectors.
+    """
+    
+    def __init__(self, cache_file: str, signature: str, max_vectors: int = 10000):
+        """
+        Initialize the cache, loading it from disk if it matches the signature
+        
+        Args:
+            cache_file: Path to the npz file the cache is persisted to
+            signature: Model and chunking settings the embeddings depend on
+            max_vectors: Maximum number of chunk vectors kept (0 disables the cache)
+        """
+        self.cache_file = cache_file
+        self.signature = signature
+        self.max_vectors = max_vectors
+        self.lock = threading.Lock()
+        
+        # Content hash -> chunk embeddings, least recently used first
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.vector_count = 0
+        self.dirty = False
+        
+        self.hits = 0
+        self.misses = 0
+        
+        if max_vectors > 0 and os.path.exists(cache_file):
+            self._load()
+    
+    def _load(self) -> None:
+        """Load the persisted entries"""
+        try:
+            with np.load(self.cache_file) as data:
+                if str(data['signature']) != self.signature:
+                    logger.info("Embedding cache was built with other settings, starting empty")
+                    return
+                hashes = data['hashes'].tolist()
+                offsets = data['offsets']
+                vectors = data['vectors']
+        except Exception as e:
+            logger.error(f"Error loading embedding cache: {e}")
+            return
+        
+        for i, content_hash in enumerate(hashes):
+            self.entries[content_hash] = vectors[offsets[i]:offsets[i + 1]]
+        self.vector_count = int(offsets[-1]) if len(offsets) else 0
+        self._evict()
+        logger.info(f"Loaded {len(self.entries)} cached document embeddings")
+    
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits"""
+        while self.vector_count > self.max_vectors and self.entries:
+            _, embeddings = self.entries.popitem(last=False)
+            self.vector_count -= len(embeddings)
+            self.dirty = True
+    
+    def get(self, content_hash: str) -> Optional[np.ndarray]:
+        """
+        Look up the chunk embeddings of a content hash
+        
+        Args:
+            content_hash: Hash of the document content
+        
+        Returns:
+            Chunk embeddings, one per row, or None on a miss
+        """
+        with self.lock:
+            embeddings = self.entries.get(content_hash)
+            if embeddings is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(content_hash)
+            self.hits += 1
+            return embeddings
+    
+    def put(self, content_hash: str, embeddings: np.ndarray) -> None:
+        """
+        Store the chunk embeddings of a content hash
+        
+        Args:
+            content_hash: Hash of the document content
+            embeddings: Chunk embeddings, one per row
+        """
+        if len(embeddings) > self.max_vectors:
+            return
+        
+        with self.lock:
+            old = self.entries.pop(content_hash, None)
+            if old is not None:
+                self.vector_count -= len(old)
+            self.entries[content_hash] = embeddings
+            self.vector_count += len(embeddings)
+            self.dirty = True
+            self._evict()
+    
+    def save(self) -> None:
+        """Write the cache to disk if it changed since the last save"""
+        with self.lock:
+            if not self.dirty:
+                return
+            hashes = list(self.entries)
+            embeddings = list(self.entries.values())
+            self.dirty = False
+        
+        offsets = np.zeros(len(embeddings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in embeddings])
+        vectors = np.vstack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+        
+        # Write to a temporary file first so a crash never leaves a partial cache
+        tmp_file = self.cache_file + ".tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, signature=np.array(self.signature), hashes=np.array(hashes),
+                         offsets=offsets, vectors=vectors)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"Error saving embedding cache: {e}")
+            self.dirty = True
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+        
+        Returns:
+            Status information
+        """
+        with self.lock:
+            return {
+                'documents': len(self.entries),
+                'vectors': self.vector_count,
+                'max_vectors': self.max_vectors,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,180 @@
+"""
+Persistent cache of processed file states for skipping unchanged files
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Files up to this size are fully covered by the quick hash
+QUICK_HASH_BYTES = 1024 * 1024
+
+class FileStateCache:
+    """
+    Track (size, mtime, hash) of processed files in a SQLite table
+    
+    States recorded with update() describe embeddings that may not be on
+    disk yet, so they are held in memory until flush() is called after the
+    vector database has been saved. A crash in between makes the files be
+    processed again instead of keeping stale embeddings.
+    """
+    
+    def __init__(self, db_file: str):
+        """
+        Initialize the file state cache
+        
+        Args:
+            db_file: Path to the SQLite database file
+        """
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        
+        # Path -> (size, mtime, hash) waiting for the next flush
+        self.pending: Dict[str, Tuple[int, float, Optional[bytes]]] = {}
+        
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_state ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, hash BLOB)"
+            )
+            self.conn.commit()
+    
+    @staticmethod
+    def quick_hash(file_path: str) -> bytes:
+        """
+        Hash the first QUICK_HASH_BYTES of a file
+        
+        Args:
+            file_path: Path to the file
+        
+        Returns:
+            Digest bytes
+        """
+        with open(file_path, 'rb') as f:
+            data = f.read(QUICK_HASH_BYTES)
+        
+        if BLAKE3_AVAILABLE:
+            return blake3.blake3(data).digest()
+        return hashlib.blake2b(data, digest_size=32).digest()
+    
+    def is_unchanged(self, file_path: str, st: os.stat_result) -> bool:
+        """
+        Check whether a file is unchanged since it was last recorded
+        
+        Args:
+            file_path: Path to the file
+            st: Current stat result for the file
+        
+        Returns:
+            True if the file content is known to be unchanged
+        """
+        with self.lock:
+            row = self.pending.get(file_path)
+            if row is None:
+                row = self.conn.execute(
+                    "SELECT size, mtime, hash FROM file_state WHERE path = ?", (file_path,)
+                ).fetchone()
+        
+        if row is None:
+            return False
+        
+        size, mtime, digest = row
+        if size != st.st_size:
+            return False
+        if mtime == st.st_mtime:
+            return True
+        
+        # Touched but possibly identical (auto-save, checkout); the quick
+        # hash only proves this for files it covers completely
+        if digest is None or st.st_size > QUICK_HASH_BYTES:
+            return False
+        
+        try:
+            if self.quick_hash(file_path) != digest:
+                return False
+        except OSError:
+            return False
+        
+        with self.lock:
+            if file_path in self.pending:
+                self.pending[file_path] = (size, st.st_mtime, digest)
+            else:
+                self.conn.execute("UPDATE file_state SET mtime = ? WHERE path = ?", (st.st_mtime, file_path))
+                self.conn.commit()
+        return True
+    
+    def digest(self, file_path: str, st: os.stat_result) -> Optional[bytes]:
+        """
+        Hash a file for update, if the quick hash covers it completely
+        
+        Called together with the stat, before the file is processed, so the
+        recorded digest never describes content newer than the embedding.
+        
+        Args:
+            file_path: Path to the file
+            st: Stat result of the file
+        
+        Returns:
+            Digest bytes, or None for large or unreadable files
+        """
+        if st.st_size > QUICK_HASH_BYTES:
+            return None
+        try:
+            return self.quick_hash(file_path)
+        except OSError as e:
+            logger.warning(f"Could not hash file {file_path}: {e}")
+            return None
+    
+    def update(self, file_path: str, st: os.stat_result, digest: Optional[bytes]) -> None:
+        """
+        Record the state of a processed file, written by the next flush
+        
+        Args:
+            file_path: Path to the file
+            st: Stat result taken before the file was processed
+            digest: Result of digest() taken with the stat
+        """
+        with self.lock:
+            self.pending[file_path] = (st.st_size, st.st_mtime, digest)
+    
+    def flush(self) -> None:
+        """Write the recorded states; call once the vector database is saved"""
+        with self.lock:
+            if not self.pending:
+                return
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO file_state (path, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                [(path, size, mtime, digest) for path, (size, mtime, digest) in self.pending.items()]
+            )
+            self.conn.commit()
+            self.pending.clear()
+    
+    def remove(self, file_path: str) -> None:
+        """
+        Forget the state of a file
+        
+        Args:
+            file_path: Path to the file
+        """
+        with self.lock:
+            self.pending.pop(file_path, None)
+            self.conn.execute("DELETE FROM file_state WHERE path = ?", (file_path,))
+            self.conn.commit()
+    
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,49 @@
+"""
+Path prefix matching for restricting searches to parts of the tree
+"""
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+class PathPrefixMatcher:
+    """
+    Match paths against a set of string prefixes
+
+    Prefixes are kept sorted with redundant ones (those extending another
+    prefix) removed, so the only prefix that can match a path is the
+    greatest one not after it, found with a single bisect.
+    """
+
+    def __init__(self, prefixes: Iterable[str]):
+        """
+        Initialize the matcher
+
+        Args:
+            prefixes: Path prefixes; a path matches if it starts with any of them
+        """
+        self.prefixes: List[str] = []
+        for prefix in sorted(set(prefixes)):
+            if not self.prefixes or not prefix.startswith(self.prefixes[-1]):
+                self.prefixes.append(prefix)
+
+    def __call__(self, path: str) -> bool:
+        """Check whether a path starts with one of the prefixes"""
+        i = bisect_right(self.prefixes, path) - 1
+        return i >= 0 and path.startswith(self.prefixes[i])
+
+    def ranges(self, sorted_paths: List[str]) -> Iterator[Tuple[int, int]]:
+        """
+        Find the matching paths in a sorted list
+
+        Args:
+            sorted_paths: Paths in ascending order
+
+        Returns:
+            Iterator of (start, end) index ranges of matching paths
+        """
+        for prefix in self.prefixes:
+            start = bisect_left(sorted_paths, prefix)
+            end = start
+            while end < len(sorted_paths) and sorted_paths[end].startswith(prefix):
+                end += 1
+            if end > start:
+                yield start, end
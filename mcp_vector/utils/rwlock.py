@@ -0,0 +1,85 @@
+"""
+Reader-writer lock for structures searched far more often than modified
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+class ReadWriteLock:
+    """
+    Lock allowing any number of readers or a single writer
+    
+    Waiting writers block new readers, so a steady stream of searches cannot
+    starve inserts. The write lock is reentrant, and its owner may also take
+    the read lock; read locks must not be nested.
+    """
+    
+    def __init__(self):
+        """Initialize an unlocked lock"""
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+    
+    def acquire_read(self) -> None:
+        """Acquire the lock for reading"""
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._write_depth += 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self) -> None:
+        """Release a read lock"""
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._write_depth -= 1
+                return
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+    
+    def acquire_write(self) -> None:
+        """Acquire the lock for writing"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+    
+    def release_write(self) -> None:
+        """Release a write lock"""
+        with self._cond:
+            self._write_depth -= 1
+            if self._write_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+    
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Hold the lock for reading within a with block"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Hold the lock for writing within a with block"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,148 @@
+"""
+Semantic cache of search results keyed by query embeddings
+"""
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    Cache search results of recent queries for near-duplicate queries
+    
+    Query embeddings are kept in a fixed-size matrix and compared with a
+    single matrix-vector product, which at this capacity is cheaper than
+    maintaining an ANN index. Entries are evicted least recently used
+    first and expire after ttl seconds or when the database changes.
+    """
+    
+    def __init__(self, dim: int, capacity: int = 512, ttl: float = 300.0, threshold: float = 0.97):
+        """
+        Initialize the semantic cache
+        
+        Args:
+            dim: Dimension of the query embeddings
+            capacity: Maximum number of cached queries
+            ttl: Seconds after which an entry expires
+            threshold: Minimum cosine similarity for a cache hit
+        """
+        self.dim = dim
+        self.capacity = capacity
+        self.ttl = ttl
+        self.threshold = threshold
+        self.lock = threading.RLock()
+        
+        # Unit-length query embeddings, one row per slot
+        self.embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        self.valid = np.zeros(capacity, dtype=bool)
+        # Slot -> (key, database version, expiry time, results)
+        self.entries: List[Optional[Tuple[Hashable, int, float, Any]]] = [None] * capacity
+        # Occupied slots in least recently used order
+        self.lru: "OrderedDict[int, None]" = OrderedDict()
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _remove(self, slot: int) -> None:
+        """Free a cache slot"""
+        self.valid[slot] = False
+        self.entries[slot] = None
+        self.lru.pop(slot, None)
+        self.free_slots.append(slot)
+    
+    def get(self, embedding: np.ndarray, key: Hashable, version: int) -> Optional[Any]:
+        """
+        Look up the results of a similar query
+        
+        Args:
+            embedding: Query embedding
+            key: Other search parameters that must match exactly
+            version: Current database version
+        
+        Returns:
+            Cached results, or None on a miss
+        """
+        query = self._normalize(embedding)
+        
+        with self.lock:
+            if not self.lru:
+                self.misses += 1
+                return None
+            
+            similarities = self.embeddings @ query
+            similarities[~self.valid] = -np.inf
+            
+            now = time.monotonic()
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for slot in candidates[np.argsort(-similarities[candidates])].tolist():
+                entry_key, entry_version, expires, results = self.entries[slot]
+                if entry_version != version or expires <= now:
+                    self._remove(slot)
+                    continue
+                if entry_key != key:
+                    continue
+                
+                self.lru.move_to_end(slot)
+                self.hits += 1
+                return results
+            
+            self.misses += 1
+            return None
+    
+    def put(self, embedding: np.ndarray, key: Hashable, version: int, results: Any) -> None:
+        """
+        Store the results of a query
+        
+        Args:
+            embedding: Query embedding
+            key: Other search parameters of the query
+            version: Database version the results were computed at
+            results: Search results
+        """
+        if self.capacity <= 0:
+            return
+        
+        with self.lock:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot, _ = self.lru.popitem(last=False)
+            
+            self.embeddings[slot] = self._normalize(embedding)
+            self.valid[slot] = True
+            self.entries[slot] = (key, version, time.monotonic() + self.ttl, results)
+            self.lru[slot] = None
+    
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self.lock:
+            for slot in list(self.lru):
+                self._remove(slot)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+        
+        Returns:
+            Status information
+        """
+        with self.lock:
+            return {
+                'entries': len(self.lru),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -2,136 +2,327 @@
 Vector database management using HNSWLib
 """
 import os
-import json
-import hnswlib
+import time
+import orjson
 import numpy as np
-from typing import Dict, List, Tuple, Optional, Any, Set
+from typing import Callable, Dict, List, Tuple, Optional, Any, Set
 from pathlib import Path
-import threading
 import logging
-from datetime import datetime
+
+from .ann_index import create_index, resolve_index_type
+from .doc_store import DocStore, MetadataDB
+from .path_filter import PathPrefixMatcher
+from .rwlock import ReadWriteLock
 
 logger = logging.getLogger(__name__)
 
+# Initial number of vector slots; the index doubles when it runs out
+INITIAL_CAPACITY = 4096
+
+# Chunks fetched from the index per requested search result
+CHUNKS_PER_RESULT = 4
+
 class VectorDatabase:
     """Vector database for storing and searching document embeddings using HNSWLib"""
     
-    def __init__(self, storage_dir: str, embedding_dim: int = 768):
+    def __init__(self, storage_dir: str, embedding_dim: int = 768,
+                 index_type: str = 'hnsw', quantization: str = 'fp16'):
         """
         Initialize the vector database
         
         Args:
             storage_dir: Directory to store vector database files
             embedding_dim: Dimension of the embedding vectors
+            index_type: 'hnsw' (hnswlib, fp32 vectors), 'hnsw_sq'
+                (faiss, scalar-quantized vectors) or 'ivfpq' (faiss,
+                product-quantized vectors for large collections)
+            quantization: Vector storage type of quantized indexes ('fp16' or 'int8')
         """
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         
-        self.index_file = self.storage_dir / "vector_index.bin"
-        self.metadata_file = self.storage_dir / "vector_metadata.json"
+        self.index_type = resolve_index_type(index_type)
+        self.quantization = quantization
+        
+        # Each index type keeps its own file; switching types starts a new index
+        if self.index_type == 'hnsw':
+            self.index_file = self.storage_dir / "vector_index.bin"
+        elif self.index_type == 'ivfpq':
+            self.index_file = self.storage_dir / "vector_index_ivfpq.npz"
+        else:
+            self.index_file = self.storage_dir / f"vector_index_{self.index_type}_{quantization}.npz"
+        # The metadata store is shared by all index types and records which
+        # index it belongs to; an index file written for other metadata is
+        # not loaded
+        self.index_key = self.index_file.name
+        self.metadata_file = self.storage_dir / "metadata.sqlite"
+        # Metadata file of older versions, imported once
+        self.legacy_metadata_file = self.storage_dir / "vector_metadata.json"
+        self.metadata_db = MetadataDB(str(self.metadata_file))
         
         self.embedding_dim = embedding_dim
         self.index = None
-        self.metadata: Dict[int, Dict[str, Any]] = {}
-        self.path_to_id: Dict[str, int] = {}
+        self.metadata = DocStore()
+        # IDs of the chunks of each document, in chunk order
+        self.path_to_ids: Dict[str, List[int]] = {}
         self.current_id = 0
-        self.lock = threading.RLock()
+        self._capacity = INITIAL_CAPACITY
+        # Searches share the lock; writes take it exclusively
+        self.lock = ReadWriteLock()
+        
+        # Sorted (path, doc_id) columns for path filters, rebuilt lazily
+        self._sorted_paths: Optional[List[str]] = None
+        self._sorted_ids: Optional[List[List[int]]] = None
+        
+        # Incremented on every write so cached search results can be invalidated
+        self.version = 0
+        
+        # Writes since the last save, for debounced persistence
+        self._dirty_count = 0
+        self._last_save = time.monotonic()
+        
+        # Called whenever everything written so far is on disk, to persist
+        # state that must not get ahead of the database (file states)
+        self.on_saved: Optional[Callable[[], None]] = None
         
         self._load_or_create_index()
     
     def _load_or_create_index(self) -> None:
         """Load existing index or create a new one"""
-        with self.lock:
-            if self.index_file.exists() and self.metadata_file.exists():
+        with self.lock.write():
+            has_metadata = not self.metadata_db.is_empty()
+            if self.index_file.exists() and (has_metadata or self.legacy_metadata_file.exists()):
                 try:
-                    # Load index
-                    self.index = hnswlib.Index(space='cosine', dim=self.embedding_dim)
-                    self.index.load_index(str(self.index_file), max_elements=100000)
-                    
                     # Load metadata
-                    with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                        loaded_data = json.load(f)
-                        self.metadata = {int(k): v for k, v in loaded_data.get('metadata', {}).items()}
-                        self.path_to_id = {v['path']: int(k) for k, v in self.metadata.items()}
-                        self.current_id = loaded_data.get('current_id', 0)
+                    capacity = 0
+                    if has_metadata:
+                        self.metadata, meta = self.metadata_db.load()
+                        self.current_id = int(meta['current_id'])
+                        capacity = int(meta.get('capacity', 0))
+                        # Metadata of older versions belongs to the hnswlib index
+                        stored_key = meta.get('index_key', "vector_index.bin")
+                    else:
+                        self._import_legacy_metadata()
+                        stored_key = "vector_index.bin"
+                    
+                    if stored_key != self.index_key:
+                        logger.info(f"Metadata belongs to {stored_key}, not {self.index_key}; rebuilding the index")
+                        self._create_new_index()
+                        return
+                    
+                    # Load index (0 keeps the capacity stored in the index file)
+                    self.index = self._new_index()
+                    self.index.load_index(str(self.index_file), max_elements=capacity, allow_replace_deleted=True)
+                    self._capacity = self.index.get_max_elements()
+                    self.path_to_ids = self.metadata.path_to_ids()
+                    self._sorted_paths = None
                     
-                    logger.info(f"Loaded vector database with {len(self.metadata)} documents")
+                    logger.info(f"Loaded vector database with {len(self.path_to_ids)} documents")
                 except Exception as e:
                     logger.error(f"Error loading vector database: {e}")
                     self._create_new_index()
             else:
                 self._create_new_index()
     
+    def _import_legacy_metadata(self) -> None:
+        """Load metadata from the JSON file of older versions"""
+        with open(self.legacy_metadata_file, 'rb') as f:
+            loaded_data = orjson.loads(f.read())
+        
+        if 'columns' in loaded_data:
+            self.metadata = DocStore.from_columns(loaded_data['columns'])
+        else:
+            # Per-document dicts
+            self.metadata = DocStore.from_dict(loaded_data.get('metadata', {}))
+        self.current_id = loaded_data.get('current_id', 0)
+        
+        # All imported rows are dirty; write them on the next save
+        self._dirty_count = len(self.metadata)
+        logger.info(f"Importing metadata from {self.legacy_metadata_file}")
+    
+    def _new_index(self):
+        """Create an empty index object of the configured type"""
+        # Vectors are normalized here, so inner product equals cosine
+        # similarity; indexes saved in cosine space load unchanged
+        return create_index(self.index_type, 'ip', self.embedding_dim, self.quantization)
+    
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """Convert one or more embeddings to unit-length float32 row vectors"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = vectors.reshape(-1, vectors.shape[-1])
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    
     def _create_new_index(self) -> None:
         """Create a new index"""
-        with self.lock:
-            self.index = hnswlib.Index(space='cosine', dim=self.embedding_dim)
-            self.index.init_index(max_elements=100000, ef_construction=200, M=16)
+        with self.lock.write():
+            self.index = self._new_index()
+            # Slots of deleted vectors are reused by new ones
+            self._capacity = INITIAL_CAPACITY
+            self.index.init_index(max_elements=self._capacity, ef_construction=200, M=16, allow_replace_deleted=True)
             self.index.set_ef(50)  # for search
-            self.metadata = {}
-            self.path_to_id = {}
+            self.metadata_db.clear()
+            self.metadata = DocStore()
+            self.path_to_ids = {}
+            self._sorted_paths = None
             self.current_id = 0
             logger.info("Created new vector database")
     
     def save(self) -> None:
-        """Save the index and metadata to disk"""
-        with self.lock:
-            if self.index is not None and len(self.metadata) > 0:
-                # Save index
-                self.index.save_index(str(self.index_file))
+        """Save the index and the changed metadata rows to disk"""
+        with self.lock.write():
+            if self.index is not None and (len(self.metadata) > 0 or self._dirty_count > 0):
+                # Write to a temporary file first so a crash never leaves a
+                # truncated index behind
+                index_tmp = str(self.index_file) + ".tmp"
+                self.index.save_index(index_tmp)
+                os.replace(index_tmp, self.index_file)
                 
-                # Save metadata
-                with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'metadata': self.metadata,
-                        'current_id': self.current_id
-                    }, f, ensure_ascii=False, indent=2)
+                changed = len(self.metadata.dirty)
+                self.metadata_db.save(self.metadata, {
+                    'current_id': self.current_id,
+                    'capacity': self._capacity,
+                    'index_key': self.index_key,
+                })
                 
-                logger.info(f"Saved vector database with {len(self.metadata)} documents")
+                logger.info(f"Saved vector database with {len(self.path_to_ids)} documents ({changed} changed rows)")
+            
+            self._dirty_count = 0
+            self._last_save = time.monotonic()
+            if self.on_saved is not None:
+                self.on_saved()
+    
+    def save_if_needed(self, min_interval: float = 5.0, min_writes: int = 100) -> bool:
+        """
+        Save the database if it has unsaved writes and a threshold is reached
+        
+        Args:
+            min_interval: Seconds since the last save after which to save
+            min_writes: Number of unsaved writes after which to save
+        
+        Returns:
+            True if the database was saved
+        """
+        with self.lock.write():
+            if self._dirty_count == 0:
+                # Nothing unsaved; states recorded since the last save are safe
+                if self.on_saved is not None:
+                    self.on_saved()
+                return False
+            
+            if self._dirty_count < min_writes and time.monotonic() - self._last_save < min_interval:
+                return False
+            
+            self.save()
+            return True
     
-    def add_document(self, path: str, embedding: np.ndarray, metadata: Dict[str, Any]) -> int:
+    def _ensure_capacity(self, count: int) -> None:
+        """
+        Grow the index so that count more vectors fit
+        
+        Args:
+            count: Number of vectors about to be added
+        """
+        # Counts deleted slots too, so this never underestimates
+        needed = self.index.get_current_count() + count
+        if needed > self._capacity:
+            while self._capacity < needed:
+                self._capacity *= 2
+            self.index.resize_index(self._capacity)
+            logger.info(f"Resized vector index to {self._capacity} elements")
+    
+    def add_document(self, path: str, embeddings: np.ndarray, metadata: Dict[str, Any]) -> List[int]:
         """
         Add or update a document in the vector database
         
         Args:
             path: Path to the document
-            embedding: Document embedding vector
+            embeddings: Embedding vector of each chunk of the document
+                (a single vector for an unchunked document)
             metadata: Additional metadata for the document
         
         Returns:
-            Document ID
-        """
-        with self.lock:
-            # Check if document already exists
-            if path in self.path_to_id:
-                doc_id = self.path_to_id[path]
-                # Update embedding
-                self.index.mark_deleted(doc_id)
-                self.index.add_items(embedding.reshape(1, -1), np.array([doc_id]))
-                # Update metadata
-                updated_metadata = {**self.metadata[doc_id], **metadata, 'updated_at': datetime.now().isoformat()}
-                self.metadata[doc_id] = updated_metadata
-                logger.info(f"Updated document in vector DB: {path}")
-                return doc_id
-            else:
-                # Add new document
-                doc_id = self.current_id
-                self.current_id += 1
+            IDs of the document's chunks
+        """
+        vectors = self._normalize(embeddings)
+        return self.add_documents_batch([path], vectors, [metadata], [len(vectors)])[0]
+    
+    def add_documents_batch(self, paths: List[str], embeddings: np.ndarray,
+                            metadatas: List[Dict[str, Any]],
+                            chunk_counts: Optional[List[int]] = None) -> List[List[int]]:
+        """
+        Add or update several documents with a single index insertion
+        
+        Args:
+            paths: Paths to the documents (without duplicates)
+            embeddings: Chunk embeddings of all documents, stacked in order
+            metadatas: Additional metadata for each document
+            chunk_counts: Number of chunks of each document (default 1 each)
+        
+        Returns:
+            IDs of each document's chunks
+        """
+        vectors = self._normalize(embeddings)
+        if chunk_counts is None:
+            chunk_counts = [1] * len(paths)
+        
+        with self.lock.write():
+            self._dirty_count += len(paths)
+            self.version += 1
+            
+            # Reuse the IDs of existing chunks (hnswlib updates those in
+            # place) and allocate IDs for new chunks
+            plans = []
+            batch_ids: List[int] = []
+            is_new: List[bool] = []
+            for path, count in zip(paths, chunk_counts):
+                old_ids = self.path_to_ids.get(path, [])
+                ids = old_ids[:count]
+                new_count = count - len(ids)
+                is_new.extend([False] * len(ids) + [True] * new_count)
+                ids = ids + list(range(self.current_id, self.current_id + new_count))
+                self.current_id += new_count
+                plans.append((old_ids, ids))
+                batch_ids.extend(ids)
+            
+            # Existing labels are updated in place; with replace_deleted
+            # hnswlib would put them in a free deleted slot and leave the old
+            # vector live under the same label. Only new labels may take
+            # deleted slots. One call per group lets hnswlib spread the
+            # insertion over its threads.
+            batch_ids_array = np.array(batch_ids, dtype=np.int64)
+            new_mask = np.array(is_new, dtype=bool)
+            if (~new_mask).any():
+                self.index.add_items(vectors[~new_mask], batch_ids_array[~new_mask], replace_deleted=False)
+            if new_mask.any():
+                self._ensure_capacity(int(new_mask.sum()))
+                self.index.add_items(vectors[new_mask], batch_ids_array[new_mask], replace_deleted=True)
+            
+            now = int(time.time() * 1000)
+            for path, metadata, (old_ids, ids) in zip(paths, metadatas, plans):
+                created_at = self.metadata.created[old_ids[0]] if old_ids else now
                 
-                self.index.add_items(embedding.reshape(1, -1), np.array([doc_id]))
+                # Delete chunks beyond the document's new length
+                for doc_id in old_ids[len(ids):]:
+                    self.index.mark_deleted(doc_id)
+                    self.metadata.delete(doc_id)
                 
-                # Add metadata
-                document_metadata = {
-                    'path': path,
-                    'created_at': datetime.now().isoformat(),
-                    'updated_at': datetime.now().isoformat(),
-                    **metadata
-                }
-                self.metadata[doc_id] = document_metadata
-                self.path_to_id[path] = doc_id
+                # Add metadata; document fields are stored once for all chunks
+                self.metadata.put_document(path, metadata)
+                content_hash = metadata.get('content_hash')
+                for chunk_index, doc_id in enumerate(ids):
+                    self.metadata.put_chunk(doc_id, path, chunk_index, content_hash, created_at, now)
                 
-                logger.info(f"Added document to vector DB: {path}")
-                return doc_id
+                if ids != old_ids:
+                    self.path_to_ids[path] = ids
+                    self._sorted_paths = None
+                
+                if old_ids:
+                    logger.info(f"Updated document in vector DB: {path} ({len(ids)} chunks)")
+                else:
+                    logger.info(f"Added document to vector DB: {path} ({len(ids)} chunks)")
+            
+            return [ids for _, ids in plans]
     
     def delete_document(self, path: str) -> bool:
         """
@@ -143,53 +334,133 @@ class VectorDatabase:
         Returns:
             True if deleted, False if not found
         """
-        with self.lock:
-            if path in self.path_to_id:
-                doc_id = self.path_to_id[path]
-                self.index.mark_deleted(doc_id)
-                del self.metadata[doc_id]
-                del self.path_to_id[path]
+        with self.lock.write():
+            if path in self.path_to_ids:
+                for doc_id in self.path_to_ids.pop(path):
+                    self.index.mark_deleted(doc_id)
+                    self.metadata.delete(doc_id)
+                self.metadata.delete_document(path)
+                self._dirty_count += 1
+                self.version += 1
+                self._sorted_paths = None
                 logger.info(f"Deleted document from vector DB: {path}")
                 return True
             return False
     
-    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _ids_under_paths(self, paths: List[str]) -> Set[int]:
+        """
+        Get the chunk IDs of documents whose path starts with one of the given paths
+        
+        Args:
+            paths: Path prefixes
+        
+        Returns:
+            Set of chunk IDs
+        """
+        # Concurrent searches may rebuild the sorted lists at the same time;
+        # the IDs are published before the paths that mark them valid
+        sorted_paths = self._sorted_paths
+        if sorted_paths is None:
+            items = sorted(self.path_to_ids.items())
+            sorted_paths = [path for path, _ in items]
+            sorted_ids = [doc_ids for _, doc_ids in items]
+            self._sorted_ids = sorted_ids
+            self._sorted_paths = sorted_paths
+        else:
+            sorted_ids = self._sorted_ids
+        
+        allowed = set()
+        for start, end in PathPrefixMatcher(paths).ranges(sorted_paths):
+            for doc_ids in sorted_ids[start:end]:
+                allowed.update(doc_ids)
+        return allowed
+    
+    def _exact_query(self, query_vector: np.ndarray, doc_ids: Set[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest documents among doc_ids by comparing every vector
+        
+        Args:
+            query_vector: Normalized query vector
+            doc_ids: Candidate document IDs
+            k: Number of neighbors to return
+        
+        Returns:
+            Tuple of (ids, distances) arrays of shape (1, k), as from knn_query
+        """
+        ids = np.fromiter(doc_ids, dtype=np.int64, count=len(doc_ids))
+        vectors = np.asarray(self.index.get_items(ids), dtype=np.float32)
+        distances = 1 - vectors @ query_vector[0]
+        
+        order = np.argsort(distances)[:k]
+        return ids[order].reshape(1, -1), distances[order].reshape(1, -1)
+    
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, paths: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Search for similar documents
         
         Args:
             query_embedding: Query embedding vector
             top_k: Number of results to return
+            paths: Optional path prefixes; only documents under them are searched
         
         Returns:
             List of similar documents with metadata and scores
         """
-        with self.lock:
+        with self.lock.read():
             if self.index is None or len(self.metadata) == 0:
                 return []
             
-            # Adjust top_k to the actual number of documents
-            actual_top_k = min(top_k, len(self.metadata))
+            # Restrict the search to documents under the given paths
+            allowed = self._ids_under_paths(paths) if paths else None
+            
+            # Fetch several chunks per requested document, as the best
+            # chunks often belong to the same documents
+            available = len(self.metadata) if allowed is None else len(allowed)
+            actual_top_k = min(top_k * CHUNKS_PER_RESULT, available)
             if actual_top_k == 0:
                 return []
             
-            # Search
-            query_vector = query_embedding.reshape(1, -1)
-            ids, distances = self.index.knn_query(query_vector, k=actual_top_k)
-            
-            # Convert distances to similarity scores (cosine)
-            scores = 1 - distances[0]
-            
-            # Get results with metadata
-            results = []
-            for i, doc_id in enumerate(ids[0]):
-                if doc_id in self.metadata:  # Ensure the document exists in metadata
-                    result = {
-                        'document_id': int(doc_id),
-                        'score': float(scores[i]),
-                        **self.metadata[doc_id]
-                    }
-                    results.append(result)
+            query_vector = self._normalize(query_embedding)
+            while True:
+                # Search
+                try:
+                    if allowed is None:
+                        ids, distances = self.index.knn_query(query_vector, k=actual_top_k)
+                    else:
+                        ids, distances = self.index.knn_query(query_vector, k=actual_top_k, filter=allowed.__contains__)
+                except RuntimeError:
+                    # The graph search found fewer than k (allowed) documents
+                    candidates = allowed if allowed is not None else set(self.metadata)
+                    ids, distances = self._exact_query(query_vector, candidates, actual_top_k)
+                
+                # Convert inner-product distances (1 - dot) to cosine similarity
+                scores = 1 - distances[0]
+                
+                # Get results with metadata, one per document scored by its best
+                # chunk; chunks come best first, so the first one seen wins
+                results = []
+                seen_paths = set()
+                for i, doc_id in enumerate(ids[0]):
+                    if doc_id in self.metadata:  # Ensure the document exists in metadata
+                        document = self.metadata[doc_id]
+                        if document['path'] in seen_paths:
+                            continue
+                        seen_paths.add(document['path'])
+                        
+                        result = {
+                            'document_id': int(doc_id),
+                            'score': float(scores[i]),
+                            **document
+                        }
+                        results.append(result)
+                        if len(results) == top_k:
+                            break
+                
+                # A few long documents can own most of the fetched chunks;
+                # widen the fetch until top_k documents are found
+                if len(results) == top_k or actual_top_k >= available:
+                    break
+                actual_top_k = min(actual_top_k * 2, available)
             
             return results
     
@@ -200,15 +471,50 @@ class VectorDatabase:
         Returns:
             Status information
         """
-        with self.lock:
+        with self.lock.read():
             return {
-                'document_count': len(self.metadata),
+                'document_count': len(self.path_to_ids),
+                'chunk_count': len(self.metadata),
                 'embedding_dimension': self.embedding_dim,
+                'index_type': self.index_type,
+                'index_capacity': self._capacity,
                 'storage_location': str(self.storage_dir),
                 'index_file_exists': self.index_file.exists(),
                 'metadata_file_exists': self.metadata_file.exists(),
             }
-            
+    
+    def close(self) -> None:
+        """Close the metadata database"""
+        with self.lock.write():
+            self.metadata_db.close()
+    
+    def has_document(self, path: str) -> bool:
+        """
+        Check whether a document is stored in the database
+        
+        Args:
+            path: Path to the document
+        
+        Returns:
+            True if the document exists
+        """
+        with self.lock.read():
+            return path in self.path_to_ids
+    
+    def get_metadata_by_path(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the metadata of a document by its path
+        
+        Args:
+            path: Path to the document
+        
+        Returns:
+            Metadata of the document's first chunk, or None if not found
+        """
+        with self.lock.read():
+            doc_ids = self.path_to_ids.get(path)
+            return self.metadata[doc_ids[0]] if doc_ids else None
+    
     def get_document_paths(self) -> Set[str]:
         """
         Get all document paths in the database
@@ -216,5 +522,5 @@ class VectorDatabase:
         Returns:
             Set of document paths
         """
-        with self.lock:
-            return set(self.path_to_id.keys())
+        with self.lock.read():
+            return set(self.path_to_ids.keys())
@@ -21,15 +21,26 @@ setup(
         "numpy>=1.22.0",
         "sentence-transformers>=2.2.2",
         "fastapi>=0.95.0",
+        "orjson>=3.8.0",
         "uvicorn>=0.21.0",
-        "pydantic>=1.10.7",
+        "uvloop>=0.17.0; sys_platform != 'win32'",
+        "httptools>=0.5.0",
+        "msgspec>=0.18.0",
         "watchdog>=3.0.0",
         "python-multipart>=0.0.5",
         "pypdf>=3.7.0",
+        "pypdfium2>=4.0.0",
         "python-pptx>=0.6.21",
         "openpyxl>=3.1.2",
+        "python-calamine>=0.1.7",
         "python-docx>=0.8.11",
+        "charset-normalizer>=3.0.0",
+        "xxhash>=3.0.0",
     ],
+    extras_require={
+        "faiss": ["faiss-cpu>=1.8.0"],
+        "test": ["pytest>=7.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "mcp-vector=mcp_vector.main:main",
@@ -0,0 +1,166 @@
+"""
+Tests for the faiss index wrappers with the hnswlib interface
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("hnswlib")
+pytest.importorskip("faiss")
+
+from mcp_vector.utils import ann_index
+from mcp_vector.utils.ann_index import FaissHNSWSQIndex, create_index, resolve_index_type
+
+DIM = 16
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _hnsw_sq(quantization='fp16'):
+    index = FaissHNSWSQIndex('ip', DIM, quantization)
+    index.init_index(max_elements=16, ef_construction=100, M=16)
+    index.set_ef(50)
+    return index
+
+def test_resolve_index_type():
+    assert resolve_index_type(None) == 'hnsw'
+    assert resolve_index_type('unknown') == 'hnsw'
+    assert resolve_index_type('hnsw_sq') == 'hnsw_sq'
+    assert isinstance(create_index('hnsw_sq', 'ip', DIM), FaissHNSWSQIndex)
+
+@pytest.mark.parametrize('quantization', ['fp16', 'int8'])
+def test_hnsw_sq_search(quantization):
+    index = _hnsw_sq(quantization)
+    vectors = _vectors(20)
+    index.add_items(vectors, range(100, 120))
+    
+    labels, distances = index.knn_query(vectors[3], k=2)
+    assert labels[0][0] == 103
+    assert distances[0][0] == pytest.approx(0.0, abs=0.02)
+    np.testing.assert_allclose(index.get_items([105])[0], vectors[5], atol=0.02)
+
+def test_hnsw_sq_replace_and_delete_leave_tombstones():
+    index = _hnsw_sq()
+    vectors = _vectors(20)
+    index.add_items(vectors, range(20))
+    
+    # Replacing a label tombstones its old position
+    index.add_items(-vectors[0], [0])
+    assert index.get_current_count() == 21
+    assert index._deleted == {0}
+    labels, distances = index.knn_query(vectors[0], k=20)
+    assert 0 in labels[0].tolist()
+    assert distances[0][labels[0].tolist().index(0)] == pytest.approx(2.0, abs=0.02)
+    
+    index.mark_deleted(1)
+    labels, _ = index.knn_query(vectors[1], k=19)
+    assert 1 not in labels[0].tolist()
+    with pytest.raises(RuntimeError):
+        index.mark_deleted(1)
+    with pytest.raises(RuntimeError):
+        index.knn_query(vectors[1], k=20)
+
+def test_hnsw_sq_compaction():
+    index = _hnsw_sq()
+    vectors = _vectors(20)
+    index.add_items(vectors, range(20))
+    
+    for label in range(5):
+        index.mark_deleted(label)
+    assert len(index._deleted) == 5
+    
+    # Crossing COMPACT_FRACTION rebuilds the index from the live vectors
+    index.mark_deleted(5)
+    assert index._deleted == set()
+    assert index.get_current_count() == 14
+    assert sorted(index._positions) == list(range(6, 20))
+    labels, _ = index.knn_query(vectors[10], k=1)
+    assert labels[0].tolist() == [10]
+    np.testing.assert_allclose(index.get_items([19])[0], vectors[19], atol=0.02)
+    assert index.index.hnsw.efSearch == 50
+
+def test_hnsw_sq_filter():
+    index = _hnsw_sq()
+    vectors = _vectors(20)
+    index.add_items(vectors, range(20))
+    
+    labels, _ = index.knn_query(vectors[0], k=3, filter=lambda label: label % 2 == 1)
+    assert all(label % 2 == 1 for label in labels[0].tolist())
+
+def test_hnsw_sq_round_trip(tmp_path):
+    index = _hnsw_sq('int8')
+    vectors = _vectors(20)
+    index.add_items(vectors, range(20))
+    index.mark_deleted(4)
+    index.save_index(str(tmp_path / "index.npz"))
+    
+    loaded = FaissHNSWSQIndex('ip', DIM, 'int8')
+    loaded.load_index(str(tmp_path / "index.npz"), max_elements=32)
+    assert loaded.get_max_elements() == 32
+    assert loaded._deleted == index._deleted
+    assert loaded._positions == index._positions
+    labels, _ = loaded.knn_query(vectors[4], k=19)
+    assert 4 not in labels[0].tolist()
+
+@pytest.fixture
+def small_train_size(monkeypatch):
+    # PQ training needs at least 256 vectors per sub-quantizer codebook
+    monkeypatch.setattr(ann_index, 'IVFPQ_TRAIN_SIZE', 300)
+
+def _ivfpq():
+    index = create_index('ivfpq', 'ip', DIM)
+    index.init_index(max_elements=16)
+    return index
+
+def test_ivfpq_buffers_until_trained(small_train_size):
+    index = _ivfpq()
+    vectors = _vectors(300)
+    index.add_items(vectors[:299], range(299))
+    assert index.index is None
+    assert index.get_current_count() == 299
+    
+    # Exact search over the buffer
+    labels, distances = index.knn_query(vectors[7], k=1)
+    assert labels[0].tolist() == [7]
+    assert distances[0][0] == pytest.approx(0.0, abs=1e-5)
+    
+    index.mark_deleted(7)
+    labels, _ = index.knn_query(vectors[7], k=298)
+    assert 7 not in labels[0].tolist()
+    
+    index.add_items(vectors[299:], [299])
+    index.add_items(vectors[7:8], [7])
+    assert index.index is not None
+    assert index.get_current_count() == 300
+
+def test_ivfpq_replace_and_delete_after_training(small_train_size):
+    index = _ivfpq()
+    vectors = _vectors(300)
+    index.add_items(vectors, range(300))
+    assert index.index is not None
+    
+    index.add_items(-vectors[0], [0])
+    assert index.get_current_count() == 300
+    assert index.get_items([0])[0] @ vectors[0] < 0
+    
+    index.mark_deleted(1)
+    assert index.get_current_count() == 299
+    labels, _ = index.knn_query(vectors[1], k=10, filter=lambda label: label != 2)
+    assert not {1, 2} & set(labels[0].tolist())
+    with pytest.raises(RuntimeError):
+        index.mark_deleted(1)
+
+@pytest.mark.parametrize('count', [5, 300])
+def test_ivfpq_round_trip(tmp_path, small_train_size, count):
+    index = _ivfpq()
+    vectors = _vectors(count)
+    index.add_items(vectors, range(count))
+    index.mark_deleted(3)
+    index.save_index(str(tmp_path / "index.npz"))
+    
+    loaded = _ivfpq()
+    loaded.load_index(str(tmp_path / "index.npz"))
+    assert loaded.get_current_count() == count - 1
+    assert (loaded.index is None) == (index.index is None)
+    labels, _ = loaded.knn_query(vectors[3], k=4)
+    assert 3 not in labels[0].tolist()
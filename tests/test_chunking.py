@@ -0,0 +1,47 @@
+"""
+Tests for splitting documents into token-bounded chunks
+"""
+import re
+
+from mcp_vector.utils.chunking import CHARS_PER_TOKEN, chunk_text
+
+class WordTokenizer:
+    """Tokenizer stub with one token per word, reporting character offsets"""
+    
+    def __call__(self, text, **kwargs):
+        return {'offset_mapping': [match.span() for match in re.finditer(r'\S+', text)]}
+
+class SlowTokenizer:
+    """Tokenizer stub without offset support, like Python tokenizers"""
+    
+    def __call__(self, text, **kwargs):
+        raise NotImplementedError("return_offset_mapping is not available")
+
+def test_short_text_is_one_chunk():
+    text = "a few words only"
+    assert chunk_text(text, WordTokenizer(), max_tokens=8, overlap=2) == [text]
+
+def test_chunks_are_overlapping_slices():
+    words = [f"w{i}" for i in range(20)]
+    text = " ".join(words)
+    
+    chunks = chunk_text(text, WordTokenizer(), max_tokens=8, overlap=3)
+    
+    assert [chunk.split() for chunk in chunks] == [words[0:8], words[5:13], words[10:18], words[15:20]]
+    assert all(chunk in text for chunk in chunks)
+
+def test_overlap_not_below_max_tokens_still_advances():
+    text = " ".join(f"w{i}" for i in range(5))
+    chunks = chunk_text(text, WordTokenizer(), max_tokens=2, overlap=4)
+    assert [chunk.split() for chunk in chunks] == [["w0", "w1"], ["w1", "w2"], ["w2", "w3"], ["w3", "w4"]]
+
+def test_character_fallback():
+    text = "x" * (10 * CHARS_PER_TOKEN)
+    
+    chunks = chunk_text(text, SlowTokenizer(), max_tokens=4, overlap=1)
+    
+    max_chars = 4 * CHARS_PER_TOKEN
+    assert all(len(chunk) <= max_chars for chunk in chunks)
+    assert chunks[0] == text[:max_chars]
+    assert chunks[1] == text[max_chars - CHARS_PER_TOKEN:2 * max_chars - CHARS_PER_TOKEN]
+    assert text.endswith(chunks[-1])
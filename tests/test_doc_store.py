@@ -0,0 +1,143 @@
+"""
+Tests for the column-oriented document store and its SQLite persistence
+"""
+import sqlite3
+
+import orjson
+import pytest
+
+from mcp_vector.utils.doc_store import DocStore, MetadataDB, format_timestamp, timestamp_ms
+
+def _add(store, path, doc_ids, **metadata):
+    store.put_document(path, {'filename': path.rsplit('/', 1)[-1], 'content_hash': 'h', **metadata})
+    for chunk_index, doc_id in enumerate(doc_ids):
+        store.put_chunk(doc_id, path, chunk_index, 'h', 1000, 2000)
+
+def test_mapping_interface():
+    store = DocStore()
+    _add(store, '/docs/a.txt', [0, 1])
+    
+    assert len(store) == 2
+    assert list(store) == [0, 1]
+    assert 1 in store and 2 not in store and 'x' not in store
+    assert store[1] == {
+        'path': '/docs/a.txt',
+        'created_at': 1000,
+        'updated_at': 2000,
+        'filename': 'a.txt',
+        'chunk_index': 1,
+        'content_hash': 'h',
+    }
+    with pytest.raises(KeyError):
+        store[5]
+
+def test_document_fields_are_shared_by_chunks():
+    store = DocStore()
+    _add(store, '/docs/a.txt', [0, 1, 2], size_bytes=10)
+    
+    assert store.documents == {'/docs/a.txt': {'filename': 'a.txt', 'size_bytes': 10}}
+    assert all(store[doc_id]['size_bytes'] == 10 for doc_id in store)
+
+def test_delete():
+    store = DocStore()
+    _add(store, '/docs/a.txt', [0, 1])
+    _add(store, '/docs/b.txt', [2])
+    store.dirty.clear()
+    
+    store.delete(0)
+    store.delete(1)
+    store.delete_document('/docs/a.txt')
+    store.delete(7)
+    
+    assert len(store) == 1
+    assert list(store) == [2]
+    assert '/docs/a.txt' not in store.documents
+    assert store.dirty == {0, 1}
+    assert store.path_to_ids() == {'/docs/b.txt': [2]}
+
+def test_legacy_dict_import():
+    store = DocStore.from_dict({
+        '0': {'path': '/a', 'chunk_index': 0, 'content_hash': 'h', 'filename': 'a',
+              'created_at': '2024-01-01T00:00:00', 'updated_at': 5},
+        '1': {'path': '/a', 'chunk_index': 1, 'content_hash': 'h', 'filename': 'a'},
+    })
+    
+    assert store[0]['created_at'] == timestamp_ms('2024-01-01T00:00:00')
+    assert store[0]['updated_at'] == 5
+    assert store[1]['chunk_index'] == 1
+    assert store.documents == {'/a': {'filename': 'a'}}
+
+def test_timestamps():
+    assert timestamp_ms(None) == 0
+    assert timestamp_ms('1234') == 1234
+    assert timestamp_ms(5) == 5
+    assert format_timestamp(0) is None
+    assert format_timestamp(timestamp_ms('2024-01-01T12:30:00')) == '2024-01-01T12:30:00'
+
+def test_round_trip(tmp_path):
+    db_file = str(tmp_path / "metadata.sqlite")
+    db = MetadataDB(db_file)
+    assert db.is_empty()
+    
+    store = DocStore()
+    _add(store, '/docs/a.txt', [0, 1])
+    _add(store, '/docs/b.txt', [2])
+    db.save(store, {'current_id': 3, 'index_key': 'vector_index.bin'})
+    assert not store.dirty and not store.dirty_paths
+    db.close()
+    
+    db = MetadataDB(db_file)
+    loaded, meta = db.load()
+    assert not db.is_empty()
+    assert meta == {'current_id': 3, 'index_key': 'vector_index.bin'}
+    assert dict(loaded) == dict(store)
+    assert not loaded.dirty
+    
+    # Only changed rows and documents are written
+    loaded.delete(2)
+    loaded.delete_document('/docs/b.txt')
+    loaded.put_chunk(3, '/docs/a.txt', 2, 'h', 1000, 3000)
+    db.save(loaded, meta)
+    db.close()
+    
+    db = MetadataDB(db_file)
+    reloaded, _ = db.load()
+    assert list(reloaded) == [0, 1, 3]
+    assert reloaded[3]['chunk_index'] == 2
+    assert set(reloaded.documents) == {'/docs/a.txt'}
+    
+    db.clear()
+    assert db.is_empty()
+    db.close()
+
+def test_legacy_rows_are_converted(tmp_path):
+    db_file = str(tmp_path / "metadata.sqlite")
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "CREATE TABLE docs (id INTEGER PRIMARY KEY, path TEXT, content_hash TEXT, "
+        "created_at INTEGER, updated_at INTEGER, extra BLOB)"
+    )
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value)")
+    for chunk_index in range(2):
+        conn.execute(
+            "INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?)",
+            (chunk_index, '/a', 'h', 1, 2, orjson.dumps({'filename': 'a', 'chunk_index': chunk_index}))
+        )
+    conn.execute("INSERT INTO meta VALUES ('current_id', 2)")
+    conn.commit()
+    conn.close()
+    
+    db = MetadataDB(db_file)
+    store, meta = db.load()
+    assert store[1] == {'path': '/a', 'created_at': 1, 'updated_at': 2, 'filename': 'a',
+                        'chunk_index': 1, 'content_hash': 'h'}
+    assert store.dirty == {0, 1}
+    
+    db.save(store, meta)
+    assert db.conn.execute("SELECT COUNT(*) FROM docs WHERE extra IS NOT NULL").fetchone()[0] == 0
+    db.close()
+    
+    db = MetadataDB(db_file)
+    reloaded, _ = db.load()
+    assert dict(reloaded) == dict(store)
+    db.close()
@@ -0,0 +1,73 @@
+"""
+Tests for the content-hash keyed cache of chunk embeddings
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mcp_vector.utils.embedding_cache import EmbeddingCache
+
+def _vectors(rows, value):
+    return np.full((rows, 4), value, dtype=np.float32)
+
+def test_get_and_put(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.npz"), "sig", max_vectors=10)
+    
+    assert cache.get("a") is None
+    cache.put("a", _vectors(2, 1.0))
+    np.testing.assert_array_equal(cache.get("a"), _vectors(2, 1.0))
+    
+    # Replacing an entry does not count its old vectors twice
+    cache.put("a", _vectors(3, 2.0))
+    assert cache.vector_count == 3
+    assert cache.get_status() == {'documents': 1, 'vectors': 3, 'max_vectors': 10, 'hits': 1, 'misses': 1}
+
+def test_evicts_least_recently_used_by_vector_count(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.npz"), "sig", max_vectors=5)
+    cache.put("a", _vectors(2, 1.0))
+    cache.put("b", _vectors(2, 2.0))
+    cache.get("a")
+    
+    cache.put("c", _vectors(2, 3.0))
+    
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.vector_count == 4
+    
+    # Documents larger than the whole cache are not stored
+    cache.put("d", _vectors(6, 4.0))
+    assert cache.get("d") is None
+    assert cache.vector_count == 4
+
+def test_round_trip(tmp_path):
+    cache_file = str(tmp_path / "cache.npz")
+    cache = EmbeddingCache(cache_file, "sig", max_vectors=10)
+    cache.put("a", _vectors(2, 1.0))
+    cache.put("b", _vectors(1, 2.0))
+    cache.save()
+    assert not cache.dirty
+    
+    loaded = EmbeddingCache(cache_file, "sig", max_vectors=10)
+    assert list(loaded.entries) == ["a", "b"]
+    np.testing.assert_array_equal(loaded.get("a"), _vectors(2, 1.0))
+    np.testing.assert_array_equal(loaded.get("b"), _vectors(1, 2.0))
+    assert loaded.vector_count == 3
+    
+    # A smaller limit evicts the oldest entries on load
+    smaller = EmbeddingCache(cache_file, "sig", max_vectors=1)
+    assert list(smaller.entries) == ["b"]
+
+def test_other_signature_starts_empty(tmp_path):
+    cache_file = str(tmp_path / "cache.npz")
+    cache = EmbeddingCache(cache_file, "model-a:256:32", max_vectors=10)
+    cache.put("a", _vectors(2, 1.0))
+    cache.save()
+    
+    other = EmbeddingCache(cache_file, "model-b:256:32", max_vectors=10)
+    assert other.get("a") is None
+    assert other.vector_count == 0
+
+def test_disabled(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.npz"), "sig", max_vectors=0)
+    cache.put("a", _vectors(1, 1.0))
+    assert cache.get("a") is None
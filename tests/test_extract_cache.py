@@ -0,0 +1,69 @@
+"""
+Tests for the in-memory cache of recent extractions
+"""
+import os
+
+import pytest
+
+from mcp_vector.file_handlers import extractors
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(extractors, '_EXTRACT_CACHE', type(extractors._EXTRACT_CACHE)())
+    monkeypatch.setattr(extractors, '_extract_cache_chars', 0)
+
+def _limit(monkeypatch, entries, chars, entry_chars):
+    monkeypatch.setattr(extractors, 'EXTRACT_CACHE_SIZE', entries)
+    monkeypatch.setattr(extractors, 'EXTRACT_CACHE_CHARS', chars)
+    monkeypatch.setattr(extractors, 'EXTRACT_CACHE_MAX_ENTRY_CHARS', entry_chars)
+
+def test_hit_returns_a_copy_of_the_metadata(monkeypatch):
+    _limit(monkeypatch, 4, 100, 50)
+    extractors._cache_put(('a', 1, 1), ("text", {'filename': 'a'}))
+    
+    text, metadata = extractors._cache_get(('a', 1, 1))
+    metadata['filename'] = 'changed'
+    
+    assert text == "text"
+    assert extractors._cache_get(('a', 1, 1)) == ("text", {'filename': 'a'})
+    assert extractors._cache_get(('a', 1, 2)) is None
+
+def test_bounded_by_entry_count(monkeypatch):
+    _limit(monkeypatch, 2, 100, 50)
+    for name in "abc":
+        extractors._cache_put((name, 1, 1), (name, {}))
+    
+    assert extractors._cache_get(('a', 1, 1)) is None
+    assert list(extractors._EXTRACT_CACHE) == [('b', 1, 1), ('c', 1, 1)]
+
+def test_bounded_by_total_characters(monkeypatch):
+    _limit(monkeypatch, 100, 25, 10)
+    for name in "abc":
+        extractors._cache_put((name, 1, 1), (name * 10, {}))
+    
+    assert list(extractors._EXTRACT_CACHE) == [('b', 1, 1), ('c', 1, 1)]
+    assert extractors._extract_cache_chars == 20
+    
+    # Replacing an entry releases the characters of the old text
+    extractors._cache_put(('c', 1, 1), ("c", {}))
+    assert extractors._extract_cache_chars == 11
+
+def test_large_documents_are_not_cached(monkeypatch):
+    _limit(monkeypatch, 100, 100, 10)
+    extractors._cache_put(('a', 1, 1), ("a" * 11, {}))
+    
+    assert extractors._cache_get(('a', 1, 1)) is None
+    assert extractors._extract_cache_chars == 0
+
+def test_modified_file_is_extracted_again(monkeypatch, tmp_path):
+    _limit(monkeypatch, 4, 1000, 100)
+    path = tmp_path / "a.txt"
+    path.write_text("first", encoding="utf-8")
+    
+    assert extractors.extract_file_content(str(path))[0] == "first"
+    assert len(extractors._EXTRACT_CACHE) == 1
+    
+    path.write_text("second", encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert extractors.extract_file_content(str(path))[0] == "second"
@@ -0,0 +1,92 @@
+"""
+Tests for the cache of processed file states
+"""
+import os
+
+from mcp_vector.utils.file_state import FileStateCache
+
+def _write(path, data):
+    path.write_bytes(data)
+    return os.stat(path)
+
+def _record(cache, path, st):
+    cache.update(str(path), st, cache.digest(str(path), st))
+
+def test_unknown_file_is_changed(tmp_path):
+    cache = FileStateCache(str(tmp_path / "state.sqlite"))
+    st = _write(tmp_path / "a.txt", b"hello")
+    assert not cache.is_unchanged(str(tmp_path / "a.txt"), st)
+    cache.close()
+
+def test_states_are_written_on_flush(tmp_path):
+    db_file = str(tmp_path / "state.sqlite")
+    path = tmp_path / "a.txt"
+    st = _write(path, b"hello")
+    
+    cache = FileStateCache(db_file)
+    _record(cache, path, st)
+    assert cache.is_unchanged(str(path), st)
+    cache.close()
+    
+    # Without a flush (the vector database was never saved) nothing is kept
+    cache = FileStateCache(db_file)
+    assert not cache.is_unchanged(str(path), st)
+    _record(cache, path, st)
+    cache.flush()
+    assert not cache.pending
+    cache.close()
+    
+    cache = FileStateCache(db_file)
+    assert cache.is_unchanged(str(path), st)
+    cache.close()
+
+def test_size_change(tmp_path):
+    cache = FileStateCache(str(tmp_path / "state.sqlite"))
+    path = tmp_path / "a.txt"
+    _record(cache, path, _write(path, b"hello"))
+    cache.flush()
+    
+    assert not cache.is_unchanged(str(path), _write(path, b"hello world"))
+    cache.close()
+
+def test_touched_file_is_compared_by_hash(tmp_path):
+    db_file = str(tmp_path / "state.sqlite")
+    cache = FileStateCache(db_file)
+    path = tmp_path / "a.txt"
+    st = _write(path, b"hello")
+    _record(cache, path, st)
+    cache.flush()
+    
+    # Same content, new mtime: unchanged, and the new mtime is recorded
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    touched = os.stat(path)
+    assert cache.is_unchanged(str(path), touched)
+    cache.close()
+    
+    cache = FileStateCache(db_file)
+    row = cache.conn.execute("SELECT mtime FROM file_state WHERE path = ?", (str(path),)).fetchone()
+    assert row[0] == touched.st_mtime
+    
+    # Same size, other content
+    st = _write(path, b"jello")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    assert not cache.is_unchanged(str(path), os.stat(path))
+    cache.close()
+
+def test_remove(tmp_path):
+    cache = FileStateCache(str(tmp_path / "state.sqlite"))
+    path_a = tmp_path / "a.txt"
+    path_b = tmp_path / "b.txt"
+    st_a = _write(path_a, b"a")
+    st_b = _write(path_b, b"b")
+    _record(cache, path_a, st_a)
+    cache.flush()
+    _record(cache, path_b, st_b)
+    
+    cache.remove(str(path_a))
+    cache.remove(str(path_b))
+    cache.flush()
+    
+    assert not cache.is_unchanged(str(path_a), st_a)
+    assert not cache.is_unchanged(str(path_b), st_b)
+    cache.close()
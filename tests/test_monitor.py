@@ -0,0 +1,82 @@
+"""
+Tests for the debounced dispatch of file events
+"""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("watchdog")
+
+from mcp_vector.file_handlers.monitor import FileMonitor
+
+class Recorder:
+    """Collect monitor callbacks in call order"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def callback(self, kind):
+        def record(path):
+            self.calls.append((kind, path))
+        return record
+
+@pytest.fixture
+def monitor(tmp_path):
+    recorder = Recorder()
+    monitor = FileMonitor([str(tmp_path)], recorder.callback('added'), recorder.callback('modified'),
+                          recorder.callback('deleted'), {'.txt'})
+    monitor.debounce_time = 0.1
+    monitor.recorder = recorder
+    
+    monitor.stopped.clear()
+    thread = threading.Thread(target=monitor._run_scheduler, daemon=True)
+    thread.start()
+    yield monitor
+    
+    monitor.stopped.set()
+    monitor._wake.set()
+    thread.join(5)
+    assert not thread.is_alive()
+
+def _wait_for(monitor, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while len(monitor.recorder.calls) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return monitor.recorder.calls
+
+def test_repeated_events_are_dispatched_once(monitor):
+    for _ in range(5):
+        monitor._schedule_event('/a.txt', 'created')
+        time.sleep(0.02)
+    monitor._schedule_event('/a.txt', 'modified')
+    
+    assert _wait_for(monitor, 1) == [('modified', '/a.txt')]
+    time.sleep(0.2)
+    assert monitor.recorder.calls == [('modified', '/a.txt')]
+    assert not monitor._pending
+
+def test_events_wait_for_the_debounce_time(monitor):
+    start = time.monotonic()
+    monitor._schedule_event('/a.txt', 'created')
+    
+    assert _wait_for(monitor, 1) == [('added', '/a.txt')]
+    assert time.monotonic() - start >= monitor.debounce_time
+
+def test_events_are_dispatched_in_deadline_order(monitor):
+    monitor._schedule_event('/a.txt', 'created')
+    monitor._schedule_event('/b.txt', 'modified')
+    monitor._schedule_event('/a.txt', 'modified')
+    
+    assert _wait_for(monitor, 2) == [('modified', '/b.txt'), ('modified', '/a.txt')]
+
+def test_callback_errors_do_not_stop_the_scheduler(monitor):
+    def fail(path):
+        raise OSError("unreadable")
+    monitor.on_file_added = fail
+    
+    monitor._schedule_event('/a.txt', 'created')
+    monitor._schedule_event('/b.txt', 'modified')
+    
+    assert _wait_for(monitor, 1) == [('modified', '/b.txt')]
+    assert not monitor.processing_files
@@ -0,0 +1,34 @@
+"""
+Tests for path prefix matching
+"""
+from mcp_vector.utils.path_filter import PathPrefixMatcher
+
+def test_redundant_prefixes_are_dropped():
+    matcher = PathPrefixMatcher(['/b/', '/a/x/', '/a/', '/a/'])
+    assert matcher.prefixes == ['/a/', '/b/']
+
+def test_match():
+    matcher = PathPrefixMatcher(['/docs/', '/src/main'])
+    
+    assert matcher('/docs/a.txt')
+    assert matcher('/src/main.py')
+    assert matcher('/src/main/app.py')
+    assert not matcher('/doc')
+    assert not matcher('/src/test.py')
+    assert not matcher('/a.txt')
+    assert not matcher('/zzz')
+
+def test_no_prefixes():
+    matcher = PathPrefixMatcher([])
+    assert not matcher('/docs/a.txt')
+    assert list(matcher.ranges(['/docs/a.txt'])) == []
+
+def test_ranges():
+    paths = sorted(['/a/1', '/a/2', '/ab', '/b/1', '/c/1', '/c/2', '/d'])
+    matcher = PathPrefixMatcher(['/a/', '/c/', '/e/'])
+    
+    ranges = list(matcher.ranges(paths))
+    
+    assert ranges == [(0, 2), (4, 6)]
+    assert [paths[i] for start, end in ranges for i in range(start, end)] == \
+        [path for path in paths if matcher(path)]
@@ -0,0 +1,77 @@
+"""
+Tests for the reader-writer lock
+"""
+import threading
+import time
+
+from mcp_vector.utils.rwlock import ReadWriteLock
+
+def _start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+    
+    def reader():
+        with lock.read():
+            inside.wait()
+    
+    threads = [_start(reader) for _ in range(3)]
+    for thread in threads:
+        thread.join(5)
+    assert not inside.broken
+
+def test_writer_excludes_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_write()
+    
+    reader = _start(lambda: (lock.acquire_read(), events.append('read'), lock.release_read()))
+    time.sleep(0.05)
+    assert events == []
+    
+    events.append('write done')
+    lock.release_write()
+    reader.join(5)
+    assert events == ['write done', 'read']
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+    
+    def writer():
+        with lock.write():
+            events.append('write')
+    
+    def reader():
+        with lock.read():
+            events.append('read')
+    
+    writer_thread = _start(writer)
+    time.sleep(0.05)
+    reader_thread = _start(reader)
+    time.sleep(0.05)
+    assert events == []
+    
+    lock.release_read()
+    writer_thread.join(5)
+    reader_thread.join(5)
+    assert events == ['write', 'read']
+
+def test_writer_may_reenter_and_read():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+        assert lock._writer == threading.get_ident()
+    assert lock._writer is None and lock._readers == 0
+    
+    # The lock is free again for other threads
+    other = _start(lambda: (lock.acquire_write(), lock.release_write()))
+    other.join(5)
+    assert not other.is_alive()
@@ -0,0 +1,69 @@
+"""
+Tests for the semantic cache of search results
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mcp_vector.utils.semantic_cache import SemanticCache
+
+DIM = 4
+
+def _query(*values):
+    return np.array(values, dtype=np.float32)
+
+def test_near_identical_query_hits():
+    cache = SemanticCache(dim=DIM, capacity=4)
+    cache.put(_query(1, 0, 0, 0), (5, None), 1, ['result'])
+    
+    assert cache.get(_query(2, 0.1, 0, 0), (5, None), 1) == ['result']
+    assert cache.get(_query(1, 1, 0, 0), (5, None), 1) is None
+    assert cache.get_status() == {'entries': 1, 'capacity': 4, 'hits': 1, 'misses': 1}
+
+def test_other_parameters_miss():
+    cache = SemanticCache(dim=DIM, capacity=4)
+    cache.put(_query(1, 0, 0, 0), (5, None), 1, ['top 5'])
+    cache.put(_query(1, 0, 0, 0), (5, ('/docs/',)), 1, ['top 5 in docs'])
+    
+    assert cache.get(_query(1, 0, 0, 0), (10, None), 1) is None
+    assert cache.get(_query(1, 0, 0, 0), (5, ('/docs/',)), 1) == ['top 5 in docs']
+
+def test_database_change_invalidates():
+    cache = SemanticCache(dim=DIM, capacity=4)
+    cache.put(_query(1, 0, 0, 0), (5, None), 1, ['result'])
+    
+    assert cache.get(_query(1, 0, 0, 0), (5, None), 2) is None
+    assert cache.get_status()['entries'] == 0
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('mcp_vector.utils.semantic_cache.time.monotonic', lambda: now[0])
+    cache = SemanticCache(dim=DIM, capacity=4, ttl=10.0)
+    cache.put(_query(1, 0, 0, 0), (5, None), 1, ['result'])
+    
+    now[0] = 109.0
+    assert cache.get(_query(1, 0, 0, 0), (5, None), 1) == ['result']
+    now[0] = 111.0
+    assert cache.get(_query(1, 0, 0, 0), (5, None), 1) is None
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticCache(dim=DIM, capacity=2)
+    cache.put(_query(1, 0, 0, 0), None, 1, 'a')
+    cache.put(_query(0, 1, 0, 0), None, 1, 'b')
+    cache.get(_query(1, 0, 0, 0), None, 1)
+    
+    cache.put(_query(0, 0, 1, 0), None, 1, 'c')
+    
+    assert cache.get(_query(0, 1, 0, 0), None, 1) is None
+    assert cache.get(_query(1, 0, 0, 0), None, 1) == 'a'
+    assert cache.get(_query(0, 0, 1, 0), None, 1) == 'c'
+
+def test_clear_and_disabled():
+    cache = SemanticCache(dim=DIM, capacity=2)
+    cache.put(_query(1, 0, 0, 0), None, 1, 'a')
+    cache.clear()
+    assert cache.get(_query(1, 0, 0, 0), None, 1) is None
+    
+    disabled = SemanticCache(dim=DIM, capacity=0)
+    disabled.put(_query(1, 0, 0, 0), None, 1, 'a')
+    assert disabled.get(_query(1, 0, 0, 0), None, 1) is None
@@ -0,0 +1,145 @@
+"""
+Tests for the vector database: updates, deletes and persistence
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("hnswlib")
+
+from mcp_vector.utils.ann_index import FAISS_AVAILABLE
+from mcp_vector.utils.vector_db import VectorDatabase
+
+DIM = 8
+
+INDEX_TYPES = [
+    'hnsw',
+    pytest.param('hnsw_sq', marks=pytest.mark.skipif(not FAISS_AVAILABLE, reason="faiss is not installed")),
+    pytest.param('ivfpq', marks=pytest.mark.skipif(not FAISS_AVAILABLE, reason="faiss is not installed")),
+]
+
+def _unit(i):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+def _add(db, path, *axes):
+    return db.add_documents_batch([path], np.vstack([_unit(i) for i in axes]),
+                                  [{'filename': path, 'content_hash': path}], [len(axes)])[0]
+
+def _search(db, axis, top_k=10, paths=None):
+    return {result['path']: result for result in db.search(_unit(axis), top_k=top_k, paths=paths)}
+
+@pytest.mark.parametrize('index_type', INDEX_TYPES)
+def test_add_and_search(tmp_path, index_type):
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM, index_type=index_type)
+    _add(db, '/docs/a.txt', 0, 1)
+    _add(db, '/docs/b.txt', 2)
+    _add(db, '/other/c.txt', 3)
+    
+    results = db.search(_unit(1), top_k=1)
+    assert [result['path'] for result in results] == ['/docs/a.txt']
+    assert results[0]['chunk_index'] == 1
+    assert results[0]['score'] == pytest.approx(1.0, abs=1e-2)
+    
+    assert set(_search(db, 3, paths=['/docs/'])) == {'/docs/a.txt', '/docs/b.txt'}
+    assert db.get_status()['document_count'] == 3
+    assert db.get_status()['chunk_count'] == 4
+    db.close()
+
+@pytest.mark.parametrize('index_type', INDEX_TYPES)
+def test_update_replaces_vectors(tmp_path, index_type):
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM, index_type=index_type)
+    old_ids = _add(db, '/a.txt', 0, 1, 2)
+    _add(db, '/b.txt', 5)
+    
+    # Fewer chunks: existing IDs are reused and the extra chunk is deleted
+    new_ids = _add(db, '/a.txt', 3, 4)
+    assert new_ids == old_ids[:2]
+    assert db.path_to_ids['/a.txt'] == new_ids
+    assert len(db.metadata) == 3
+    
+    # The old vectors no longer match
+    assert _search(db, 0)['/a.txt']['score'] == pytest.approx(0.0, abs=1e-2)
+    assert _search(db, 4)['/a.txt']['score'] == pytest.approx(1.0, abs=1e-2)
+    db.close()
+
+def test_hnswlib_update_does_not_leave_old_vector_live(tmp_path):
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM, index_type='hnsw')
+    _add(db, '/a.txt', 0)
+    _add(db, '/b.txt', 1)
+    db.delete_document('/b.txt')
+    
+    # The update happens while a deleted slot is free; it must stay in place
+    [doc_id] = _add(db, '/a.txt', 2)
+    assert db.index.get_current_count() == 2
+    labels, _ = db.index.knn_query(_unit(0), k=1)
+    assert labels[0].tolist() == [doc_id]
+    np.testing.assert_allclose(db.index.get_items([doc_id])[0], _unit(2), atol=1e-6)
+    
+    # A new document takes the deleted slot instead of growing the index
+    _add(db, '/c.txt', 3)
+    assert db.index.get_current_count() == 2
+    assert set(_search(db, 3)) == {'/a.txt', '/c.txt'}
+    db.close()
+
+@pytest.mark.parametrize('index_type', INDEX_TYPES)
+def test_delete(tmp_path, index_type):
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM, index_type=index_type)
+    _add(db, '/a.txt', 0, 1)
+    _add(db, '/b.txt', 2)
+    
+    assert db.delete_document('/a.txt')
+    assert not db.delete_document('/a.txt')
+    assert not db.has_document('/a.txt')
+    assert db.get_document_paths() == {'/b.txt'}
+    assert set(_search(db, 0)) == {'/b.txt'}
+    assert '/a.txt' not in db.metadata.documents
+    db.close()
+
+@pytest.mark.parametrize('index_type', INDEX_TYPES)
+def test_round_trip(tmp_path, index_type):
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM, index_type=index_type)
+    _add(db, '/a.txt', 0, 1)
+    _add(db, '/b.txt', 2)
+    _add(db, '/c.txt', 3)
+    db.delete_document('/c.txt')
+    db.save()
+    expected = dict(db.metadata)
+    db.close()
+    
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM, index_type=index_type)
+    assert dict(db.metadata) == expected
+    assert db.path_to_ids == {'/a.txt': [0, 1], '/b.txt': [2]}
+    assert db.get_metadata_by_path('/b.txt')['filename'] == '/b.txt'
+    assert set(_search(db, 1)) == {'/a.txt', '/b.txt'}
+    
+    # IDs continue after the reloaded ones
+    assert _add(db, '/d.txt', 4) == [4]
+    db.close()
+
+def test_index_grows_past_initial_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr('mcp_vector.utils.vector_db.INITIAL_CAPACITY', 4)
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM)
+    for i in range(6):
+        _add(db, f'/{i}.txt', i)
+    
+    assert db.get_status()['index_capacity'] >= 6
+    assert len(_search(db, 5)) == 6
+    db.close()
+
+def test_on_saved_runs_after_every_save(tmp_path):
+    db = VectorDatabase(str(tmp_path), embedding_dim=DIM)
+    calls = []
+    db.on_saved = lambda: calls.append(len(db.metadata.dirty))
+    
+    _add(db, '/a.txt', 0)
+    assert not db.save_if_needed(min_interval=3600, min_writes=100)
+    assert calls == []
+    
+    db.save()
+    assert calls == [0]
+    
+    # Nothing is unsaved, so states recorded meanwhile may be written
+    assert not db.save_if_needed()
+    assert calls == [0, 0]
+    db.close()